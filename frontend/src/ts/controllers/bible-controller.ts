@@ -1,5 +1,5 @@
 import { cachedFetchJson } from "../utils/json-data";
-import { shuffle } from "../utils/arrays";
+import { randomElementFromArray, shuffle } from "../utils/arrays";
 import { LocalStorageWithSchema } from "../utils/local-storage-with-schema";
 import { subscribe } from "../observables/config-event";
 import { z } from "zod";
@@ -20,8 +20,55 @@ type BibleBookData = {
   chapters: Record<string, BibleVerse[]>;
 };
 
-// Theme index: theme -> book slug -> chapter -> verse numbers
-type ThemeIndex = Record<string, Record<string, Record<string, number[]>>>;
+// Precomputed by scripts/generate-bible-quotes.py --index-dir during the
+// build: one flat [chapter, verseStart, verseEnd, length, ...] array per
+// length group
+type PassageIndex = {
+  groups: [number, number][];
+  passages: number[][];
+};
+
+// A chapter range of one book: its verses plus the passage index rows of
+// those chapters, so a single small fetch is enough to start a test
+type BibleShard = BibleBookData & {
+  passages: number[][];
+};
+
+// One entry of bible/shards.json. counts are passages per length group,
+// themes the same counts restricted to each theme that has any
+type ShardInfo = {
+  book: string;
+  file: string;
+  chapters: [number, number];
+  size: number;
+  counts: number[];
+  themes: Record<string, number[]>;
+};
+
+type ShardManifest = {
+  groups: [number, number][];
+  shards: ShardInfo[];
+};
+
+type PassageRef = {
+  data: BibleBookData;
+  chapter: string;
+  verseStart: number;
+  verseEnd: number;
+  // For themed passages, the chapter's theme runs: only those verses count
+  themeRuns?: number[];
+};
+
+const PASSAGE_ROW_SIZE = 4;
+
+// Verse counts chapters are chunked into, and the shortest passage kept
+const PASSAGE_CHUNK_SIZES = [1, 2, 3, 5, 8, 12];
+const MIN_PASSAGE_LENGTH = 11;
+
+// Theme index: theme -> book slug -> chapter -> verse runs, a flat sorted
+// [first, last, first, last, ...] list of inclusive, merged verse ranges
+type ThemeVerseRuns = Record<string, number[]>;
+type ThemeIndex = Record<string, Record<string, ThemeVerseRuns>>;
 
 // Same character-length groups as original monkeytype quotes
 const LENGTH_GROUPS: [number, number][] = [
@@ -30,6 +77,12 @@ const LENGTH_GROUPS: [number, number][] = [
   [301, 600], // 2 = long
 ];
 
+// The groups of a passage index, which also has the longest passages
+const PASSAGE_INDEX_GROUPS: [number, number][] = [
+  ...LENGTH_GROUPS,
+  [601, 9999],
+];
+
 const selectedBookLS = new LocalStorageWithSchema({
   key: "bibleBook",
   schema: z.string(),
@@ -46,6 +99,8 @@ let selectedBook: string = selectedBookLS.get() ?? "all";
 let selectedTheme: string = selectedThemeLS.get() ?? "all";
 let booksCache: BibleBook[] | null = null;
 let themesCache: ThemeIndex | null = null;
+// undefined until fetched, null if the build has no shards
+let shardManifestCache: ShardManifest | null | undefined;
 export type BiblePassage = {
   text: string;
   book: string;
@@ -54,7 +109,7 @@ export type BiblePassage = {
   verseEnd: number;
 };
 
-let currentVerseQueue: BiblePassage[] = [];
+let currentVerseQueue: PassageRef[] = [];
 let queueIndex = 0;
 
 export function getSelectedBook(): string {
@@ -110,89 +165,143 @@ export function getThemeNames(): string[] {
   return Object.keys(themesCache);
 }
 
-function buildQuoteText(verses: BibleVerse[]): string {
-  return verses.map((v) => v.t).join(" ");
+function buildPassage(ref: PassageRef): BiblePassage {
+  const verses = (ref.data.chapters[ref.chapter] ?? []).filter(
+    (v) =>
+      v.v >= ref.verseStart &&
+      v.v <= ref.verseEnd &&
+      (ref.themeRuns === undefined || inVerseRuns(ref.themeRuns, v.v)),
+  );
+  return {
+    text: verses.map((v) => v.t).join(" "),
+    book: ref.data.name,
+    chapter: ref.chapter,
+    verseStart: ref.verseStart,
+    verseEnd: ref.verseEnd,
+  };
 }
 
-function filterVersesByTheme(
-  verses: BibleVerse[],
-  allowedVerses: Set<number>,
-): BibleVerse[] {
-  return verses.filter((v) => allowedVerses.has(v.v));
+function inVerseRuns(runs: number[], verse: number): boolean {
+  for (let i = 0; i < runs.length; i += 2) {
+    if ((runs[i] as number) > verse) return false;
+    if (verse <= (runs[i + 1] as number)) return true;
+  }
+  return false;
 }
 
-function generateAllPassages(
-  data: BibleBookData,
-  themeVerseFilter: Record<string, Set<number>> | null,
-): BiblePassage[] {
-  const passages: BiblePassage[] = [];
-
-  for (const chapter of Object.keys(data.chapters)) {
-    let verses = data.chapters[chapter] as BibleVerse[];
-
-    // If a theme filter is active, only use matching verses
-    if (themeVerseFilter !== null) {
-      const allowed = themeVerseFilter[chapter];
-      if (allowed === undefined) continue;
-      verses = filterVersesByTheme(verses, allowed);
-      if (verses.length === 0) continue;
+// [verseStart, verseEnd, length] of every chunk of the given verses, the
+// same chunks scripts/generate-bible-quotes.py chunk_passages() makes
+function chunkPassages(verses: BibleVerse[]): [number, number, number][] {
+  const chunks: [number, number, number][] = [];
+  for (const chunkSize of PASSAGE_CHUNK_SIZES) {
+    for (let i = 0; i < verses.length; i += chunkSize) {
+      const chunk = verses.slice(i, i + chunkSize);
+      const length = chunk.reduce((sum, v) => sum + v.t.length + 1, -1);
+      if (length >= MIN_PASSAGE_LENGTH) {
+        chunks.push([
+          (chunk[0] as BibleVerse).v,
+          (chunk[chunk.length - 1] as BibleVerse).v,
+          length,
+        ]);
+      }
     }
+  }
+  return chunks;
+}
 
-    // Generate passages at multiple chunk sizes to ensure good coverage
-    // across short/medium/long length groups
-    const chunkSizes = [1, 2, 3, 5, 8, 12];
-    for (const chunkSize of chunkSizes) {
-      for (let i = 0; i < verses.length; i += chunkSize) {
-        const chunk = verses.slice(i, i + chunkSize);
-        const text = buildQuoteText(chunk);
-        if (text.length > 10) {
-          passages.push({
-            text,
-            book: data.name,
-            chapter,
-            verseStart: chunk[0]?.v ?? 0,
-            verseEnd: chunk[chunk.length - 1]?.v ?? 0,
-          });
-        }
-      }
+function isInLengthGroups(length: number, quoteLengths: number[]): boolean {
+  if (quoteLengths.length === 0) return true;
+  return quoteLengths.some((ql) => {
+    const group = LENGTH_GROUPS[ql];
+    if (group === undefined) return false;
+    return length >= group[0] && length <= group[1];
+  });
+}
+
+// Used when the build did not make an index for the book (the dev server)
+function buildPassageIndex(data: BibleBookData): PassageIndex {
+  const passages: number[][] = PASSAGE_INDEX_GROUPS.map(() => []);
+  for (const [chapter, verses] of Object.entries(data.chapters)) {
+    const seen = new Set<string>();
+    for (const [verseStart, verseEnd, length] of chunkPassages(verses)) {
+      const group = PASSAGE_INDEX_GROUPS.findIndex(
+        ([low, high]) => length >= low && length <= high,
+      );
+      const key = `${verseStart}-${verseEnd}`;
+      if (group === -1 || seen.has(key)) continue;
+      seen.add(key);
+      passages[group]?.push(Number(chapter), verseStart, verseEnd, length);
     }
   }
+  return { groups: PASSAGE_INDEX_GROUPS, passages };
+}
 
-  return passages;
+// Themed passages are chunked from only the theme's verses of each chapter,
+// so a passage may skip the verses in between
+function selectThemedPassages(
+  data: BibleBookData,
+  quoteLengths: number[],
+  themeVerseFilter: ThemeVerseRuns,
+): PassageRef[] {
+  const refs: PassageRef[] = [];
+  for (const [chapter, themeRuns] of Object.entries(themeVerseFilter)) {
+    const verses = (data.chapters[chapter] ?? []).filter((v) =>
+      inVerseRuns(themeRuns, v.v),
+    );
+    for (const [verseStart, verseEnd, length] of chunkPassages(verses)) {
+      if (!isInLengthGroups(length, quoteLengths)) continue;
+      refs.push({ data, chapter, verseStart, verseEnd, themeRuns });
+    }
+  }
+  return refs;
 }
 
-function filterByQuoteLength(
-  passages: BiblePassage[],
+function selectPassages(
+  data: BibleBookData,
+  index: PassageIndex,
   quoteLengths: number[],
-): BiblePassage[] {
-  if (quoteLengths.length === 0) return passages;
-
-  return passages.filter((p) => {
-    const len = p.text.length;
-    return quoteLengths.some((ql) => {
-      const group = LENGTH_GROUPS[ql];
-      if (group === undefined) return false;
-      return len >= group[0] && len <= group[1];
-    });
-  });
+): PassageRef[] {
+  // Rows are already bucketed by length group, so only the requested
+  // groups are visited and no text is built until a passage is used
+  const groups =
+    quoteLengths.length === 0
+      ? index.passages
+      : quoteLengths
+          .filter((ql) => LENGTH_GROUPS[ql] !== undefined)
+          .map((ql) => index.passages[ql] ?? []);
+
+  const refs: PassageRef[] = [];
+  for (const rows of groups) {
+    for (let i = 0; i < rows.length; i += PASSAGE_ROW_SIZE) {
+      refs.push({
+        data,
+        chapter: String(rows[i]),
+        verseStart: rows[i + 1] as number,
+        verseEnd: rows[i + 2] as number,
+      });
+    }
+  }
+  return refs;
 }
 
-function getThemeVerseFilter(
-  bookSlug: string,
-): Record<string, Set<number>> | null {
+function getThemeVerseFilter(bookSlug: string): ThemeVerseRuns | null {
   if (selectedTheme === "all" || themesCache === null) return null;
 
   const themeData = themesCache[selectedTheme];
   if (themeData === undefined) return null;
 
-  const bookData = themeData[bookSlug];
-  if (bookData === undefined) return null;
+  return themeData[bookSlug] ?? null;
+}
 
-  const result: Record<string, Set<number>> = {};
-  for (const [chapter, verses] of Object.entries(bookData)) {
-    result[chapter] = new Set(verses);
+async function getShardManifest(): Promise<ShardManifest | null> {
+  if (shardManifestCache !== undefined) return shardManifestCache;
+  try {
+    shardManifestCache =
+      await cachedFetchJson<ShardManifest>("bible/shards.json");
+  } catch {
+    shardManifestCache = null;
   }
-  return result;
+  return shardManifestCache;
 }
 
 function getBooksForTheme(): string[] | null {
@@ -207,14 +316,76 @@ function getBooksForTheme(): string[] | null {
 async function loadPassagesFromBook(
   bookSlug: string,
   quoteLengths: number[],
-): Promise<BiblePassage[]> {
-  const data = await cachedFetchJson<BibleBookData>(`bible/${bookSlug}.json`);
+): Promise<PassageRef[]> {
   const themeFilter = getThemeVerseFilter(bookSlug);
-  const all = generateAllPassages(data, themeFilter);
-  return filterByQuoteLength(all, quoteLengths);
+  if (themeFilter !== null) {
+    const data = await cachedFetchJson<BibleBookData>(
+      `bible/${bookSlug}.json`,
+    );
+    return selectThemedPassages(data, quoteLengths, themeFilter);
+  }
+
+  const [data, index] = await Promise.all([
+    cachedFetchJson<BibleBookData>(`bible/${bookSlug}.json`),
+    cachedFetchJson<PassageIndex>(`bible/passages/${bookSlug}.json`).catch(
+      () => null,
+    ),
+  ]);
+  return selectPassages(data, index ?? buildPassageIndex(data), quoteLengths);
 }
 
-async function loadPassages(quoteLengths: number[]): Promise<BiblePassage[]> {
+// Passages the shard offers for the current length and theme selection,
+// counted the way selectPassages and selectThemedPassages pick them
+function countShardPassages(shard: ShardInfo, quoteLengths: number[]): number {
+  const themed =
+    selectedTheme !== "all" &&
+    themesCache?.[selectedTheme]?.[shard.book] !== undefined;
+  const counts = themed ? shard.themes[selectedTheme] : shard.counts;
+  if (counts === undefined) return 0;
+
+  const groups =
+    quoteLengths.length === 0
+      ? counts.map((_, i) => i)
+      : quoteLengths.filter((ql) => LENGTH_GROUPS[ql] !== undefined);
+  return groups.reduce((sum, group) => sum + (counts[group] ?? 0), 0);
+}
+
+async function loadPassagesFromShard(
+  quoteLengths: number[],
+): Promise<PassageRef[]> {
+  const manifest = await getShardManifest();
+  if (manifest === null) return [];
+
+  const themedBooks = getBooksForTheme();
+  const candidates = manifest.shards.filter((shard) => {
+    if (selectedBook !== "all") {
+      if (shard.book !== selectedBook) return false;
+    } else if (themedBooks !== null && !themedBooks.includes(shard.book)) {
+      return false;
+    }
+    return countShardPassages(shard, quoteLengths) > 0;
+  });
+  if (candidates.length === 0) return [];
+
+  const shard = randomElementFromArray(candidates);
+  const data = await cachedFetchJson<BibleShard>(`bible/shards/${shard.file}`);
+  const themeFilter = getThemeVerseFilter(shard.book);
+  if (themeFilter !== null) {
+    return selectThemedPassages(data, quoteLengths, themeFilter);
+  }
+  return selectPassages(
+    data,
+    { groups: manifest.groups, passages: data.passages },
+    quoteLengths,
+  );
+}
+
+async function loadPassages(quoteLengths: number[]): Promise<PassageRef[]> {
+  // The shard manifest says up front which small file can satisfy the
+  // selection, so one fetch replaces loading whole books until one matches
+  const fromShard = await loadPassagesFromShard(quoteLengths);
+  if (fromShard.length > 0) return fromShard;
+
   const themedBooks = getBooksForTheme();
 
   // Determine which book slugs to try
@@ -245,11 +416,7 @@ async function loadPassages(quoteLengths: number[]): Promise<BiblePassage[]> {
   }
 
   // Last resort: load from primary book without length filter
-  const data = await cachedFetchJson<BibleBookData>(
-    `bible/${primarySlug}.json`,
-  );
-  const themeFilter = getThemeVerseFilter(primarySlug);
-  return generateAllPassages(data, themeFilter);
+  return loadPassagesFromBook(primarySlug, []);
 }
 
 export async function getRandomPassage(
@@ -267,9 +434,9 @@ export async function getRandomPassage(
     queueIndex = 0;
   }
 
-  const passage = currentVerseQueue[queueIndex] as BiblePassage;
+  const ref = currentVerseQueue[queueIndex] as PassageRef;
   queueIndex++;
-  return passage;
+  return buildPassage(ref);
 }
 
 // Invalidate queue when quote length changes so new filter applies
@@ -0,0 +1,36 @@
+import { Plugin } from "vite";
+import { execFileSync } from "node:child_process";
+import path from "node:path";
+
+/**
+ * Generates the Bible passage indexes and shards (and their fetch manifest)
+ * from the whole-book files in `dist/bible`, so only the books themselves
+ * have to be committed.
+ * Runs scripts/generate-bible-quotes.py, which needs python3 on the PATH.
+ * Must come before minifyJson so the generated files get minified too.
+ * @returns
+ */
+export function bibleIndex(): Plugin {
+  return {
+    name: "bible-index",
+    apply: "build",
+    generateBundle() {
+      const start = performance.now();
+
+      execFileSync(
+        "python3",
+        [
+          path.resolve("../scripts/generate-bible-quotes.py"),
+          "--index-dir",
+          path.resolve("./dist/bible"),
+        ],
+        { stdio: "inherit" },
+      );
+
+      const end = performance.now();
+      console.log(
+        `\x1b[90mBuilt Bible indexes in ${Math.round(end - start)} ms\x1b[0m`,
+      );
+    },
+  };
+}
@@ -16,6 +16,7 @@ import { fontawesomeSubset } from "./vite-plugins/fontawesome-subset";
 import { fontPreview } from "./vite-plugins/font-preview";
 import { envConfig } from "./vite-plugins/env-config";
 import { languageHashes } from "./vite-plugins/language-hashes";
+import { bibleIndex } from "./vite-plugins/bible-index";
 import { minifyJson } from "./vite-plugins/minify-json";
 import { versionFile } from "./vite-plugins/version-file";
 import { oxlintChecker } from "./vite-plugins/oxlint-checker";
@@ -182,6 +183,7 @@ function getPlugins({
       },
     ]),
     injectPreload(),
+    bibleIndex(),
     minifyJson(),
   ];
 
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the stages of scripts/generate-bible-quotes.py against a local
+corpus served over HTTP, at several multiples of the curated reference count.
+
+Stages measured per scale:
+  parse       parse_reference() over every reference
+  download    cold fetch of every needed book into an empty cache
+  revalidate  the same fetch again, answered from the cache (304s)
+  index       streamed decode into a BookIndex for every book
+  extract     extract_verses() for every reference
+  serialize   format_json() of the resulting quotes file
+
+Each scale runs in its own process so peak RSS is per scale. Wall times are
+the best of --repeat runs; allocations come from a separate tracemalloc pass
+so tracing overhead never shows up in the timings.
+
+By default the corpus is synthetic (deterministic, shaped to fit every curated
+reference); --corpus points at a directory of real book files instead, e.g. a
+local mirror of aruljohn/Bible-kjv. Results are written as JSON with --output
+and compared against an earlier run with --baseline.
+"""
+
+import argparse
+import contextlib
+import functools
+import http.server
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from quotes_lib import QUOTE_GROUPS, format_json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_PATH = os.path.join(SCRIPT_DIR, "generate-bible-quotes.py")
+DEFAULT_SCALES = [1, 10, 100]
+# Below this many seconds of slowdown a stage is within timer and scheduler noise
+MIN_REGRESSION_SECONDS = 0.05
+SEED = 1611
+WORDS = (
+    "and the lord god said unto him of them that is in his for they shall be "
+    "thou thy thee me my not all which with upon were this heaven earth land "
+    "people house king son children day hand man word name spirit light"
+).split()
+
+
+def load_generator():
+    spec = importlib.util.spec_from_file_location("generate_bible_quotes", GENERATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def curated_refs(gen) -> list[str]:
+    refs = []
+    seen = set()
+    for _, category in gen.CATEGORIES:
+        for ref in category:
+            if ref not in seen:
+                seen.add(ref)
+                refs.append(ref)
+    return refs
+
+
+def write_synthetic_corpus(gen, directory: str):
+    """One book file per BOOK_FILES entry, big enough for every curated reference."""
+    rng = random.Random(SEED)
+    shape = {}
+    for ref in curated_refs(gen):
+        book, chapter, _, end_verse = gen.parse_reference(ref)
+        chapters, verses = shape.get(book, (20, 30))
+        shape[book] = (max(chapters, chapter), max(verses, end_verse))
+
+    for book, filename in gen.BOOK_FILES.items():
+        chapters, verses = shape.get(book, (20, 30))
+        data = {"book": book, "count": str(chapters), "chapters": []}
+        for c in range(1, chapters + 1):
+            data["chapters"].append({
+                "chapter": str(c),
+                "verses": [
+                    {"verse": str(v), "text": " ".join(rng.choices(WORDS, k=rng.randint(6, 45))).capitalize() + "."}
+                    for v in range(1, verses + 1)
+                ],
+            })
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+def corpus_shape(gen, directory: str) -> dict:
+    """{book: [verse count per chapter]} for every book file in the corpus."""
+    shape = {}
+    for book, filename in gen.BOOK_FILES.items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            index = gen.BookIndex.from_stream(f)
+        shape[book] = list(index.chapter_sizes)
+    return shape
+
+
+def scaled_refs(gen, shape: dict, scale: int) -> list[str]:
+    """The curated references plus random valid ones, scale times as many in total."""
+    refs = curated_refs(gen)
+    target = len(refs) * scale
+    rng = random.Random(SEED + scale)
+    books = sorted(shape)
+    while len(refs) < target:
+        book = rng.choice(books)
+        sizes = shape[book]
+        chapter = rng.randrange(len(sizes)) + 1
+        if not sizes[chapter - 1]:
+            continue
+        start = rng.randint(1, sizes[chapter - 1])
+        end = min(start + rng.choice([0, 0, 1, 2, 4, 8]), sizes[chapter - 1])
+        refs.append(gen.format_source(book, chapter, start, end))
+    return refs
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory: str) -> tuple[http.server.ThreadingHTTPServer, str]:
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_stages(gen, refs: list[str], source_url: str, workers: int, traced: bool) -> dict:
+    """Run every stage once. Returns {stage: seconds} or, when traced, allocation stats."""
+    results = {}
+
+    def stage(name, fn):
+        if traced:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            value = fn()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {"alloc_peak_bytes": peak - before, "retained_bytes": current - before}
+        else:
+            start = time.perf_counter()
+            value = fn()
+            results[name] = time.perf_counter() - start
+        return value
+
+    parsed = stage("parse", lambda: [gen.parse_reference(ref) for ref in refs])
+    needed = sorted({p[0] for p in parsed if p})
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = gen.BookCache(cache_dir)
+        fetch = lambda: dict(gen.iter_books(needed, cache, source_url, workers=workers))  # noqa: E731
+        digests = stage("download", fetch)
+        stage("revalidate", fetch)
+        books = stage("index", lambda: {
+            name: gen.read_book(cache, digest) for name, digest in digests.items() if digest
+        })
+
+    def extract():
+        quotes = []
+        for ref, p in zip(refs, parsed):
+            if p and p[0] in books:
+                text = gen.extract_verses(books[p[0]], p[1], p[2], p[3])
+                if text:
+                    quotes.append({"text": text, "source": ref, "length": len(text), "id": len(quotes) + 1})
+        return quotes
+
+    quotes = stage("extract", extract)
+    output = {"language": "english", "groups": QUOTE_GROUPS, "quotes": quotes}
+    stage("serialize", lambda: format_json(output, expand_depth=3))
+    return {"references": len(refs), "books": len(books), "quotes": len(quotes), "stages": results}
+
+
+def run_scale(scale: int, corpus: str, repeat: int, workers: int) -> dict:
+    """Benchmark one scale in this process (called in a fresh subprocess per scale)."""
+    gen = load_generator()
+    server, url = serve(corpus)
+    try:
+        refs = scaled_refs(gen, corpus_shape(gen, corpus), scale)
+        timings = [run_stages(gen, refs, url, workers, traced=False) for _ in range(max(1, repeat))]
+        allocations = run_stages(gen, refs, url, workers, traced=True)
+    finally:
+        server.shutdown()
+
+    stages = {}
+    for name in timings[0]["stages"]:
+        stages[name] = {
+            "seconds": round(min(t["stages"][name] for t in timings), 6),
+            **allocations["stages"][name],
+        }
+    result = {key: timings[0][key] for key in ("references", "books", "quotes")}
+    result.update({"scale": scale, "peak_rss_kb": peak_rss_kb(), "stages": stages})
+    return result
+
+
+def compare(results: list[dict], baseline: dict, max_regression: float,
+            min_seconds: float = MIN_REGRESSION_SECONDS) -> list[str]:
+    """Print per-stage deltas against a baseline run. Returns stages that regressed,
+    i.e. got more than `max_regression` slower and more than `min_seconds` slower."""
+    previous = {r["scale"]: r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nCompared to baseline ({baseline.get('meta', {}).get('date', 'unknown date')}):")
+    for result in results:
+        old = previous.get(result["scale"])
+        if old is None:
+            continue
+        for name, stats in result["stages"].items():
+            before = old["stages"].get(name, {}).get("seconds")
+            if not before:
+                continue
+            change = stats["seconds"] / before - 1
+            flag = ""
+            if change > max_regression and stats["seconds"] - before > min_seconds:
+                flag = "  REGRESSION"
+                regressions.append(f"{result['scale']}x {name}: {change:+.0%}")
+            print(f"  {result['scale']:>4}x {name:<11} {before:>9.4f}s -> {stats['seconds']:>9.4f}s {change:+7.1%}{flag}")
+    return regressions
+
+
+def print_results(results: list[dict]):
+    stage_names = list(results[0]["stages"])
+    print(f"\n{'scale':>6} {'refs':>7} {'books':>5} {'rss MB':>7}  " + " ".join(f"{n:>11}" for n in stage_names))
+    for r in results:
+        times = " ".join(f"{r['stages'][n]['seconds']:>10.4f}s" for n in stage_names)
+        print(f"{r['scale']:>5}x {r['references']:>7} {r['books']:>5} {r['peak_rss_kb'] / 1024:>7.1f}  {times}")
+    print("\nPeak traced allocations per stage:")
+    for r in results:
+        allocs = " ".join(f"{n}={r['stages'][n]['alloc_peak_bytes'] / 1024:.0f}K" for n in stage_names)
+        print(f"  {r['scale']:>4}x {allocs}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Bible quote generator.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="multiples of the curated reference count to run (default: 1 10 100)")
+    parser.add_argument("--corpus", help="directory of book JSON files to serve instead of a synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per scale; the best is kept")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="with --baseline, fail if a stage is this much slower (default: 0.25)")
+    parser.add_argument("--min-regression-seconds", type=float, default=MIN_REGRESSION_SECONDS,
+                        help="with --baseline, ignore slowdowns smaller than this many seconds "
+                             f"(default: {MIN_REGRESSION_SECONDS})")
+    parser.add_argument("--worker-scale", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.worker_scale is not None:
+        # stdout carries the result; the generator's progress output goes to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_scale(args.worker_scale, args.corpus, args.repeat, args.workers)
+        json.dump(result, sys.stdout)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = tmp
+            write_synthetic_corpus(load_generator(), corpus)
+
+        results = []
+        for scale in args.scales:
+            print(f"Running {scale}x...")
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker-scale", str(scale), "--corpus", corpus,
+                 "--repeat", str(args.repeat), "--workers", str(args.workers)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(proc.stdout))
+
+    print_results(results)
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generator_version": load_generator().GENERATOR_VERSION,
+            "corpus": args.corpus or "synthetic",
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression, args.min_regression_seconds)
+        if regressions:
+            for regression in regressions:
+                print(f"  SLOWER THAN BASELINE: {regression}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
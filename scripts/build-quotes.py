@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Rebuilds or checks quote files in frontend/static/quotes with the same
+assembly step (quotes_lib.py) generate-bible-quotes.py uses for english.json.
+
+Every file gets its lengths recomputed and is written back in the repo's
+prettier layout. Opt-in passes:
+  --normalize      NFC-normalize text; prose also gets spaces collapsed and trimmed
+  --dedupe         drop quotes whose text repeats an earlier one
+  --sort-by-group  order quotes by the file's own length groups
+  --reid           renumber ids 1..n (changes user-facing quote ids, use with care)
+
+Each file is streamed through the passes and written back a quote at a
+time, so memory use does not grow with the size of a file. Files are
+processed in parallel on a process pool. With --check nothing is
+written and the exit code is 1 if any file would change, so it can gate CI.
+"""
+
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from quotes_lib import STATIC_DIR, rebuild_quote_file
+
+QUOTES_DIR = os.path.join(STATIC_DIR, "quotes")
+
+
+def process_file(path: str, options: dict) -> dict:
+    """Rebuild one quote file. Returns a summary for the report."""
+    result = {"file": os.path.basename(path), "changed": False, "stats": {}, "error": None}
+    try:
+        changed, stats, count = rebuild_quote_file(path, options["check"], **options["build"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result["quotes"] = count
+    result["stats"] = dict(+stats)
+    result["changed"] = changed
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or check Monkeytype quote files.")
+    parser.add_argument("files", nargs="*",
+                        help="quote files to process (default: every file in frontend/static/quotes)")
+    parser.add_argument("--check", action="store_true",
+                        help="report what would change without writing; exit 1 if anything would")
+    parser.add_argument("--normalize", action="store_true", help="NFC-normalize and tidy whitespace")
+    parser.add_argument("--dedupe", action="store_true", help="drop quotes with duplicate text")
+    parser.add_argument("--sort-by-group", action="store_true", help="order quotes by length group")
+    parser.add_argument("--reid", action="store_true", help="renumber quote ids 1..n")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per CPU)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = args.files or sorted(glob.glob(os.path.join(QUOTES_DIR, "*.json")))
+    options = {
+        "check": args.check,
+        "build": {
+            "normalize": args.normalize,
+            "dedupe": args.dedupe,
+            "sort_by_group": args.sort_by_group,
+            "reid": args.reid,
+        },
+    }
+
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(process_file, files, [options] * len(files)))
+
+    totals = Counter()
+    errors = 0
+    changed = 0
+    for result in results:
+        if result["error"]:
+            errors += 1
+            print(f"  ERROR {result['file']}: {result['error']}", file=sys.stderr)
+            continue
+        totals.update(result["stats"])
+        totals["quotes"] += result["quotes"]
+        if result["changed"]:
+            changed += 1
+            details = ", ".join(f"{k} {v}" for k, v in sorted(result["stats"].items())) or "formatting"
+            print(f"  {'WOULD CHANGE' if args.check else 'UPDATED'} {result['file']}: {details}")
+
+    summary = ", ".join(f"{k} {v}" for k, v in sorted(totals.items()))
+    print(f"\n{len(files)} files, {changed} {'to update' if args.check else 'updated'}, {errors} errors ({summary})")
+    if errors or (args.check and changed):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
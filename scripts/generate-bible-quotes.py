@@ -5,15 +5,70 @@ frontend/static/quotes/english.json for Monkeytype.
 
 Downloads full book JSON files (no rate limits), then extracts curated verses locally.
 Target: ~200 short (<=100 chars), ~200 medium (101-300 chars), ~200 long (301+ chars)
+
+Books are cached on disk and revalidated on later runs, rebuilds are
+incremental, and shared quote-file code lives in quotes_lib.py. With --full it
+also writes the Bible-mode files in frontend/static/bible; run with --help for
+the other outputs and options.
 """
 
+import argparse
+import hashlib
+import importlib.util
+import io
 import json
 import re
+import threading
+import time
+import urllib.error
 import urllib.request
 import os
+import sqlite3
 import sys
+import tempfile
+from array import array
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+try:
+    import numpy
+except ImportError:  # optional, only speeds up --balance
+    numpy = None
+
+from quotes_lib import (
+    ERROR, METRICS, QUOTE_GROUPS, REPO_ROOT, STATIC_DIR, OutputWriter, file_sha256, format_json, format_size,
+    is_hashed_name, js_length, length_group, normalize_quote_text, publish, quote_features_json,
+    stream_json_members, validate_quote_data, write_quotes, write_text,
+)
 
 GITHUB_RAW = "https://raw.githubusercontent.com/aruljohn/Bible-kjv/master"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(SCRIPT_DIR, ".cache", "bible-kjv")
+DOWNLOAD_WORKERS = 8
+# Bytes read from a download (or the cache) at a time
+FETCH_BLOCK_SIZE = 1 << 16
+USER_AGENT = "monkeytype-quote-gen/1.0"
+# Bump whenever a change here alters generated output, to invalidate manifests and stored texts
+GENERATOR_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+# Each reference's extracted text, with the hash of the book it came from
+REF_STORE_NAME = "refs.sqlite"
+QUOTES_PATH = os.path.join(STATIC_DIR, "quotes", "english.json")
+# Every id issued in each quotes file in the repo, so ids outlive the cache
+ID_LEDGER_PATH = os.path.join(REPO_ROOT, "scripts", "quote-ids.json")
+BIBLE_DIR = os.path.join(STATIC_DIR, "bible")
+# Seconds between checks of this script in --watch mode
+WATCH_INTERVAL = 0.25
+# Verse counts the frontend chunks chapters into, and the shortest passage it keeps
+PASSAGE_CHUNK_SIZES = [1, 2, 3, 5, 8, 12]
+MIN_PASSAGE_LENGTH = 11
+# Verse text per chapter-range shard written by --index-dir
+SHARD_SIZE = 16 * 1024
+# Stands in for the last verse when a theme reference names a whole chapter
+WHOLE_CHAPTER = 999
+# Longest passage --balance will pick, in verses
+MAX_SELECTED_VERSES = 12
 
 # Map of book names used in our references -> GitHub filenames
 BOOK_FILES = {
@@ -23,12 +78,17 @@ BOOK_FILES = {
     "Numbers": "Numbers.json",
     "Deuteronomy": "Deuteronomy.json",
     "Joshua": "Joshua.json",
+    "Judges": "Judges.json",
     "Ruth": "Ruth.json",
     "1 Samuel": "1Samuel.json",
     "2 Samuel": "2Samuel.json",
+    "1 Kings": "1Kings.json",
+    "2 Kings": "2Kings.json",
     "1 Chronicles": "1Chronicles.json",
     "2 Chronicles": "2Chronicles.json",
+    "Ezra": "Ezra.json",
     "Nehemiah": "Nehemiah.json",
+    "Esther": "Esther.json",
     "Job": "Job.json",
     "Psalm": "Psalms.json",
     "Proverbs": "Proverbs.json",
@@ -42,10 +102,13 @@ BOOK_FILES = {
     "Hosea": "Hosea.json",
     "Joel": "Joel.json",
     "Amos": "Amos.json",
+    "Obadiah": "Obadiah.json",
+    "Jonah": "Jonah.json",
     "Micah": "Micah.json",
     "Nahum": "Nahum.json",
     "Habakkuk": "Habakkuk.json",
     "Zephaniah": "Zephaniah.json",
+    "Haggai": "Haggai.json",
     "Zechariah": "Zechariah.json",
     "Malachi": "Malachi.json",
     "Matthew": "Matthew.json",
@@ -65,15 +128,27 @@ BOOK_FILES = {
     "1 Timothy": "1Timothy.json",
     "2 Timothy": "2Timothy.json",
     "Titus": "Titus.json",
+    "Philemon": "Philemon.json",
     "Hebrews": "Hebrews.json",
     "James": "James.json",
     "1 Peter": "1Peter.json",
     "2 Peter": "2Peter.json",
     "1 John": "1John.json",
+    "2 John": "2John.json",
+    "3 John": "3John.json",
     "Jude": "Jude.json",
     "Revelation": "Revelation.json",
 }
 
+# Names the frontend shows (and derives bible/<slug>.json from) where they
+# differ from the names used in references
+BOOK_DISPLAY_NAMES = {
+    "Psalm": "Psalms",
+    "Song of Solomon": "Songs of Solomon",
+}
+
+NEW_TESTAMENT_START = "Matthew"
+
 # ============================================================
 # Curated verse references organized by category
 # Format: "Book Chapter:Verse" or "Book Chapter:Start-End"
@@ -354,6 +429,84 @@ OTHER_POPULAR = [
     "James 1:2-8",
 ]
 
+# ============================================================
+# Themed passages for frontend/static/bible/themes.json
+# Same format as above; "Book Chapter" covers the whole chapter
+# and a bare book name the whole book
+# ============================================================
+
+THEMES = {
+    "wisdom": [
+        "Proverbs", "Ecclesiastes", "Job 28", "Job 38", "Job 39", "Job 42:1-6",
+        "Psalm 1", "Psalm 19", "Psalm 37", "Psalm 49", "Psalm 90", "Psalm 111",
+        "Psalm 112", "Psalm 119:1-16", "Psalm 119:97-144", "James 1:2-8",
+        "James 1:17", "James 1:19-27", "James 3",
+    ],
+    "prophecy": [
+        "Isaiah 7:14", "Isaiah 9:6-7", "Isaiah 11:1-10", "Isaiah 40",
+        "Isaiah 42:1-9", "Isaiah 53", "Isaiah 55", "Isaiah 61:1-3",
+        "Jeremiah 1:4-10", "Jeremiah 23:5-6", "Jeremiah 29:11-14",
+        "Jeremiah 31:31-34", "Ezekiel 37:1-14", "Ezekiel 36:26-28",
+        "Daniel 2:31-45", "Daniel 7:13-14", "Daniel 9:24-27", "Daniel 12:1-4",
+        "Joel 2:28-32", "Micah 5:2-5", "Zechariah 9:9-10", "Zechariah 14:1-9",
+        "Malachi 3:1-4", "Malachi 4", "Revelation 1:1-8", "Revelation 4",
+        "Revelation 19:11-16", "Revelation 20", "Revelation 21:1-8",
+        "Revelation 22",
+    ],
+    "love": [
+        "Song of Solomon 1", "Song of Solomon 2", "Song of Solomon 3:1-5",
+        "Song of Solomon 4", "Song of Solomon 8:6-7", "1 Corinthians 13",
+        "1 John 3:1-3", "1 John 3:11", "1 John 3:14", "1 John 3:16-18",
+        "1 John 3:23-24", "1 John 4:7-21", "John 3:16-17", "John 13:34-35",
+        "John 14:15", "John 14:21", "John 14:23-24", "John 15:9-14",
+        "John 15:17", "Romans 5:5-8", "Romans 8:28", "Romans 8:31-32",
+        "Romans 8:35", "Romans 8:37-39", "Romans 12:9-10", "Romans 13:8-10",
+        "Ephesians 3:17-19", "Ephesians 5:1-2", "Ephesians 5:25",
+        "Ephesians 5:28", "Ephesians 5:33", "Ruth 1:16-17", "Psalm 36:5-10",
+        "Psalm 86:5", "Psalm 86:13", "Psalm 86:15", "Psalm 103:8-13",
+        "Psalm 103:17", "Psalm 136", "Colossians 3:12-14", "1 Peter 4:8",
+    ],
+    "faith": [
+        "Hebrews 11", "Hebrews 12:1-3", "Romans 1:17", "Romans 3:21-28",
+        "Romans 4:1-5", "Romans 4:16-25", "Romans 5:1-2", "Romans 8:24-25",
+        "Romans 10:9-11", "Romans 10:17", "Galatians 2:16", "Galatians 2:20",
+        "Galatians 3:6-9", "Galatians 3:11", "Galatians 3:14",
+        "Galatians 3:22-26", "Galatians 5:6", "Ephesians 2:8-10",
+        "Ephesians 6:10-18", "James 2:14-26", "Matthew 17:20",
+        "Matthew 21:21-22", "Mark 11:22-24", "Habakkuk 2:4", "Psalm 27:1-5",
+        "Psalm 27:13-14", "Psalm 46", "Psalm 91", "2 Corinthians 5:7",
+        "1 Peter 1:5-9", "Philippians 4:13",
+    ],
+    "salvation": [
+        "John 3:3", "John 3:5", "John 3:14-18", "John 3:36", "John 5:24",
+        "John 10:9-10", "John 10:27-29", "John 14:6", "Romans 3:23-26",
+        "Romans 5:8-11", "Romans 6:23", "Romans 8:1-2", "Romans 8:28-30",
+        "Romans 10:9-10", "Romans 10:13", "Ephesians 1:7", "Ephesians 1:13-14",
+        "Ephesians 2:1-10", "Acts 2:38", "Acts 4:12", "Acts 16:30-31",
+        "Titus 3:4-7", "1 Peter 1:3-5", "1 Peter 1:18-19", "1 Peter 2:24",
+        "2 Corinthians 5:17-21", "Isaiah 53:4-6", "Isaiah 59:1-2",
+        "Psalm 51:1-17", "Colossians 1:13-14", "1 Timothy 1:15", "1 John 1:9",
+    ],
+    "creation": [
+        "Genesis 1", "Genesis 2", "Psalm 8", "Psalm 19:1-6", "Psalm 24:1-2",
+        "Psalm 33:6-9", "Psalm 104", "Psalm 148", "John 1:1-5", "John 1:10",
+        "John 1:14", "Colossians 1:15-17", "Hebrews 1:1-3", "Hebrews 1:10",
+        "Hebrews 11:3", "Romans 1:20", "Isaiah 40:26", "Isaiah 40:28",
+        "Isaiah 45:12", "Isaiah 45:18", "Nehemiah 9:6", "Revelation 4:11",
+        "Job 38",
+    ],
+    "prayer": [
+        "Matthew 6:5-15", "Matthew 7:7-11", "Matthew 18:19-20",
+        "Matthew 26:39", "Matthew 26:41", "Luke 11:1-13", "Luke 18:1-14",
+        "John 14:13-14", "John 15:7", "John 15:16", "John 17",
+        "Philippians 4:6-7", "1 Thessalonians 5:16-18", "James 5:13-18",
+        "1 John 5:14-15", "Psalm 5:1-3", "Psalm 17:1-8", "Psalm 34",
+        "Psalm 51:1-17", "Psalm 86", "Psalm 139", "Ephesians 6:18",
+        "Colossians 4:2", "Romans 8:26-27", "Hebrews 4:16",
+        "2 Chronicles 7:14", "Jeremiah 29:12-13", "Daniel 9:3-19",
+    ],
+}
+
 
 def parse_reference(ref: str):
     """Parse 'Book Chapter:Verse' or 'Book Chapter:Start-End' into components."""
@@ -368,42 +521,260 @@ def parse_reference(ref: str):
     return book, chapter, start_verse, end_verse
 
 
-def download_book(book_name: str, cache: dict) -> dict | None:
-    """Download a book JSON from GitHub. Caches in memory."""
-    if book_name in cache:
-        return cache[book_name]
+def parse_theme_reference(ref: str):
+    """Like parse_reference, but 'Book Chapter' also covers the whole chapter and a
+    bare book name the whole book (chapter None). Quotes never use these forms,
+    since their source has to name real verses."""
+    if ref in BOOK_FILES:
+        return ref, None, 1, WHOLE_CHAPTER
+    m = re.match(r'^(.+?)\s+(\d+)$', ref)
+    if m:
+        return m.group(1), int(m.group(2)), 1, WHOLE_CHAPTER
+    return parse_reference(ref)
+
+
+class BookCache:
+    """Content-addressed on-disk cache for downloaded book files.
+
+    Bodies live in objects/<sha256>.json and index.json maps each URL to its
+    object hash plus the ETag/Last-Modified validators the server sent.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.dirty = False
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", f"{digest}.json")
+
+    def lookup(self, url: str) -> dict | None:
+        with self.lock:
+            return self.index.get(url)
+
+    def digest(self, url: str) -> str | None:
+        """The hash of the body cached for `url`, if its object is still intact."""
+        entry = self.lookup(url)
+        if entry is None or file_sha256(self.object_path(entry["sha256"])) != entry["sha256"]:
+            return None
+        return entry["sha256"]
+
+    def open(self, digest: str):
+        """The cached body with this hash, as a binary file."""
+        return open(self.object_path(digest), "rb")
 
+    def store(self, url: str, body: bytes, etag: str | None, last_modified: str | None) -> str:
+        return self.store_stream(url, io.BytesIO(body), etag, last_modified)
+
+    def store_stream(self, url: str, stream, etag: str | None, last_modified: str | None) -> str:
+        """Copy a body into the cache a block at a time. Returns its hash."""
+        objects = os.path.join(self.root, "objects")
+        os.makedirs(objects, exist_ok=True)
+        tmp = os.path.join(objects, f"incoming.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as f:
+                for block in iter(lambda: stream.read(FETCH_BLOCK_SIZE), b""):
+                    digest.update(block)
+                    f.write(block)
+            os.replace(tmp, self.object_path(digest.hexdigest()))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self.lock:
+            self.index[url] = {
+                "sha256": digest.hexdigest(),
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self.dirty = True
+        return digest.hexdigest()
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.index_path)
+        self.dirty = False
+
+
+def download_book(book_name: str, cache: BookCache, source_url: str = GITHUB_RAW,
+                  offline: bool = False) -> str | None:
+    """Fetch a book's raw JSON into the on-disk cache, revalidating what is
+    already there. Returns the hash to open it by with cache.open()."""
     filename = BOOK_FILES.get(book_name)
     if not filename:
         print(f"  WARNING: No file mapping for book '{book_name}'", file=sys.stderr)
+        METRICS.count("books.unmapped")
         return None
 
-    url = f"{GITHUB_RAW}/{filename}"
-    print(f"  Downloading {filename}...")
+    with METRICS.span("fetch", "network", book=book_name):
+        digest, source = _fetch(filename, cache, source_url, offline)
+    if digest is not None:
+        METRICS.count(f"books.{source}")
+        METRICS.count(f"bytes.{source}", os.path.getsize(cache.object_path(digest)))
+    else:
+        METRICS.count("books.failed")
+    return digest
+
+
+def _fetch(filename: str, cache: BookCache, source_url: str, offline: bool) -> tuple[str | None, str]:
+    """Returns the body's hash and where it came from: downloaded, revalidated, offline or stale."""
+    url = f"{source_url}/{filename}"
+    cached = cache.digest(url)
+    if offline:
+        if cached is None:
+            print(f"  MISSING from cache (offline): {filename}", file=sys.stderr)
+            return None, "missing"
+        return cached, "offline"
+
+    headers = {"User-Agent": USER_AGENT}
+    entry = cache.lookup(url) if cached is not None else None
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "monkeytype-quote-gen/1.0"})
+        req = urllib.request.Request(url, headers=headers)
         with urllib.request.urlopen(req, timeout=30) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-        cache[book_name] = data
-        return data
+            digest = cache.store_stream(url, resp, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        print(f"  Downloaded {filename}")
+        return digest, "downloaded"
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached is not None:
+            return cached, "revalidated"
+        print(f"  FAILED to download {filename}: {e}", file=sys.stderr)
     except Exception as e:
         print(f"  FAILED to download {filename}: {e}", file=sys.stderr)
-        return None
 
+    if cached is not None:
+        print(f"  Using stale cached copy of {filename}", file=sys.stderr)
+        return cached, "stale"
+    return None, "failed"
+
+
+def iter_books(book_names, cache: BookCache, source_url: str = GITHUB_RAW,
+               offline: bool = False, workers: int = DOWNLOAD_WORKERS):
+    """Yield (book name, body hash) in the given order, fetching on a bounded thread pool.
+
+    Bodies go straight to the cache on disk, a block at a time, and at most
+    `workers` books are fetched ahead of the consumer.
+    """
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for name in book_names:
+            pending.append((name, pool.submit(download_book, name, cache, source_url, offline)))
+            if len(pending) >= workers:
+                done_name, future = pending.popleft()
+                yield done_name, future.result()
+        while pending:
+            done_name, future = pending.popleft()
+            yield done_name, future.result()
+    cache.save()
+
+
+class BookIndex:
+    """One book's verses parsed once into a single text buffer.
+
+    Verse texts are joined with single spaces into `text`; `offsets[i]` is
+    where slot i starts and `chapter_starts[c - 1]` is the first slot of
+    chapter c, so any (chapter, start, end) range resolves to one slice.
+    Slots follow the verse numbers, so a verse missing from the source is an
+    empty slot taking no room in `text`, and the verses after it keep their
+    numbers.
+    """
+
+    def __init__(self, book_data: dict):
+        self._load(book_data.get("chapters", []))
+
+    @classmethod
+    def from_bible_json(cls, data: dict) -> "BookIndex":
+        """Index a book from its bible_book_json() file."""
+        return cls({"chapters": [
+            {"chapter": chapter, "verses": [{"verse": v["v"], "text": v["t"]} for v in verses]}
+            for chapter, verses in data["chapters"].items()
+        ]})
 
-def extract_verses(book_data: dict, chapter: int, start_verse: int, end_verse: int) -> str | None:
-    """Extract verse text from downloaded book data."""
-    for ch in book_data.get("chapters", []):
-        if int(ch["chapter"]) == chapter:
-            texts = []
-            for v in ch.get("verses", []):
-                vnum = int(v["verse"])
-                if start_verse <= vnum <= end_verse:
-                    texts.append(v["text"].strip())
-            if texts:
-                return " ".join(texts)
-            break
-    return None
+    @classmethod
+    def from_stream(cls, stream) -> "BookIndex":
+        """Index a book from a text stream, decoding one chapter at a time."""
+        index = cls({})
+        for key, value in stream_json_members(stream, ("chapters",)):
+            if key == "chapters":
+                index._load(value)
+        return index
+
+    def _load(self, chapter_items):
+        chapters = {}
+        for ch in chapter_items:
+            # Normalized on the way in, so odd Unicode in a source never reaches any output
+            verses = {int(v["verse"]): normalize_quote_text(v["text"]) for v in ch.get("verses", [])}
+            chapters[int(ch["chapter"])] = [verses.get(n, "") for n in range(1, max(verses, default=0) + 1)]
+
+        texts = []
+        self.chapter_starts = array("I")
+        self.chapter_sizes = array("I")
+        for number in range(1, max(chapters, default=0) + 1):
+            verses = chapters.get(number, [])
+            self.chapter_starts.append(len(texts))
+            self.chapter_sizes.append(len(verses))
+            texts.extend(verses)
+
+        self.offsets = array("I", [0])
+        for t in texts:
+            self.offsets.append(self.offsets[-1] + (len(t) + 1 if t else 0))
+        self.text = " ".join(t for t in texts if t)
+
+    def slot_range(self, chapter: int, start_verse: int, end_verse: int) -> tuple[int, int] | None:
+        """Slots [first, last) covering the verse range, clipped to the chapter."""
+        if not 1 <= chapter <= len(self.chapter_sizes):
+            return None
+        size = self.chapter_sizes[chapter - 1]
+        start_verse = max(start_verse, 1)
+        end_verse = min(end_verse, size)
+        if start_verse > end_verse:
+            return None
+        base = self.chapter_starts[chapter - 1]
+        return base + start_verse - 1, base + end_verse
+
+    def slot_length(self, first: int, last: int) -> int:
+        """Length of the joined text of slots [first, last), -1 if all are empty."""
+        return self.offsets[last] - self.offsets[first] - 1
+
+    def chapter_verses(self, chapter: int) -> list[str]:
+        """All verse texts of a chapter by verse number, "" for missing verses."""
+        first, last = self.slot_range(chapter, 1, WHOLE_CHAPTER) or (0, 0)
+        return [self.text[self.offsets[i]:self.offsets[i + 1] - 1] for i in range(first, last)]
+
+    def passage(self, chapter: int, start_verse: int, end_verse: int) -> str | None:
+        slots = self.slot_range(chapter, start_verse, end_verse)
+        if slots is None:
+            return None
+        first, last = slots
+        return self.text[self.offsets[first]:max(self.offsets[last] - 1, self.offsets[first])]
+
+
+def read_book(cache: BookCache, digest: str) -> BookIndex:
+    """Index a cached book, decoding it from disk one chapter at a time."""
+    with cache.open(digest) as f:
+        return BookIndex.from_stream(io.TextIOWrapper(f, encoding="utf-8"))
+
+
+def extract_verses(book: BookIndex, chapter: int, start_verse: int, end_verse: int) -> str | None:
+    """Extract verse text from an indexed book."""
+    return book.passage(chapter, start_verse, end_verse) or None
 
 
 def format_source(book: str, chapter: int, start_verse: int, end_verse: int) -> str:
@@ -413,102 +784,1564 @@ def format_source(book: str, chapter: int, start_verse: int, end_verse: int) ->
     return f"{book} {chapter}:{start_verse}-{end_verse}"
 
 
-def main():
-    all_refs = []
-    seen = set()
+def book_display_name(book: str) -> str:
+    return BOOK_DISPLAY_NAMES.get(book, book)
 
-    for category_name, category in [
-        ("Genesis", GENESIS),
-        ("Psalms", PSALMS),
-        ("Proverbs", PROVERBS),
-        ("Words of Jesus", WORDS_OF_JESUS),
-        ("Other Popular", OTHER_POPULAR),
-    ]:
-        for ref in category:
-            if ref not in seen:
-                seen.add(ref)
-                all_refs.append(ref)
-        print(f"  {category_name}: {len(category)} refs ({len(seen)} unique total)")
 
-    print(f"\nTotal unique references: {len(all_refs)}")
+def book_slug(book: str) -> str:
+    """File name stem the frontend uses for a book, e.g. 'songs-of-solomon'."""
+    return book_display_name(book).lower().replace(" ", "-")
 
-    # Figure out which books we need to download
-    books_needed = set()
-    for ref in all_refs:
+
+# ============================================================
+# Multi-translation corpus
+# Translations share one verse-ID space and one structure;
+# verse strings are interned, so identical text is kept once.
+# ============================================================
+
+# The translation english.json is built from; its books come from --source-url
+PRIMARY_TRANSLATION = "kjv"
+# Display names for translation codes. Sources must use the aruljohn/Bible-kjv
+# layout (BOOK_FILES names and schema); add them with --translation CODE=URL.
+TRANSLATION_NAMES = {
+    "kjv": "King James Version",
+}
+CORPUS_VERSION = 1
+BOOK_NUMBERS = {book: n for n, book in enumerate(BOOK_FILES, start=1)}
+BOOK_NAMES = list(BOOK_FILES)
+
+
+def verse_id(book: str, chapter: int, verse: int) -> int:
+    """A verse packed into one int as BBCCCVVV, e.g. John 3:16 is 43003016."""
+    return BOOK_NUMBERS[book] * 1_000_000 + chapter * 1_000 + verse
+
+
+def split_verse_id(vid: int) -> tuple[str, int, int]:
+    book_number, rest = divmod(vid, 1_000_000)
+    return BOOK_NAMES[book_number - 1], rest // 1_000, rest % 1_000
+
+
+class TextPool:
+    """Interned strings, each distinct text stored once and referred to by index.
+
+    Index 0 is the empty string, which stands for a verse a translation lacks.
+    """
+
+    def __init__(self):
+        self.strings = [""]
+        self.ids = {"": 0}
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def intern(self, text: str) -> int:
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return sid
+
+
+class Corpus:
+    """Any number of translations over one verse-ID space.
+
+    The structure (verses per chapter, the most any translation has) is kept
+    once per book, and each translation adds just an array of TextPool ids per
+    chapter, so memory grows with distinct text rather than with translations.
+    A reference resolves to a verse-ID range once and reads out in every
+    translation.
+    """
+
+    def __init__(self):
+        self.pool = TextPool()
+        self.chapter_sizes = {}  # book -> verses per chapter
+        self.verses = {}  # translation -> book -> string ids per chapter
+
+    def add(self, translation: str, book: str, index: BookIndex):
+        sizes = self.chapter_sizes.setdefault(book, array("I"))
+        chapters = self.verses.setdefault(translation, {})[book] = []
+        for chapter in range(1, len(index.chapter_sizes) + 1):
+            ids = array("I", map(self.pool.intern, index.chapter_verses(chapter)))
+            chapters.append(ids)
+            if chapter > len(sizes):
+                sizes.append(0)
+            sizes[chapter - 1] = max(sizes[chapter - 1], len(ids))
+
+    def resolve(self, ref: str) -> tuple[int, int] | None:
+        """First and last verse id of a reference, clipped to its chapter."""
         parsed = parse_reference(ref)
-        if parsed:
-            books_needed.add(parsed[0])
-    print(f"Books to download: {len(books_needed)}\n")
+        if not parsed or parsed[0] not in self.chapter_sizes:
+            return None
+        book, chapter, start_verse, end_verse = parsed
+        sizes = self.chapter_sizes[book]
+        if not 1 <= chapter <= len(sizes):
+            return None
+        start_verse, end_verse = max(start_verse, 1), min(end_verse, sizes[chapter - 1])
+        if start_verse > end_verse:
+            return None
+        return verse_id(book, chapter, start_verse), verse_id(book, chapter, end_verse)
+
+    def passage(self, translation: str, first: int, last: int) -> str | None:
+        """Text of verses first..last (within one chapter), leaving out any the translation lacks."""
+        book, chapter, start_verse = split_verse_id(first)
+        chapters = self.verses.get(translation, {}).get(book, [])
+        if chapter > len(chapters):
+            return None
+        ids = chapters[chapter - 1][start_verse - 1:start_verse + last - first]
+        return " ".join(self.pool.strings[i] for i in ids if i) or None
 
-    # Download all needed books
-    book_cache = {}
-    for book_name in sorted(books_needed):
-        download_book(book_name, book_cache)
+    def verse_ids(self, translation: str, book: str):
+        """String ids of every verse slot of a book in canonical order, 0 where missing."""
+        chapters = self.verses.get(translation, {}).get(book, [])
+        for chapter, size in enumerate(self.chapter_sizes[book]):
+            ids = chapters[chapter] if chapter < len(chapters) else ()
+            yield from ids
+            yield from [0] * (size - len(ids))
 
-    print(f"\nDownloaded {len(book_cache)} books. Extracting verses...\n")
+    def stats(self) -> dict:
+        slots = sum(sum(sizes) for sizes in self.chapter_sizes.values())
+        filled = sum(len(ids) for books in self.verses.values() for chapters in books.values() for ids in chapters)
+        return {
+            "translations": len(self.verses),
+            "verses": slots,
+            "verse_texts": filled,
+            "distinct_texts": len(self.pool) - 1,
+            "text_bytes": sum(len(t.encode("utf-8")) for t in self.pool.strings),
+        }
 
-    # Extract all verses
+
+def load_translation(corpus: Corpus, translation: str, cache: BookCache, source_url: str,
+                     offline: bool = False, workers: int = DOWNLOAD_WORKERS) -> int:
+    """Add every book of a translation to the corpus. Returns how many were found."""
+    loaded = 0
+    for book, digest in iter_books(BOOK_NAMES, cache, source_url, offline, workers):
+        if digest is None:
+            continue
+        with METRICS.span("index", book=book, translation=translation):
+            corpus.add(translation, book, read_book(cache, digest))
+        loaded += 1
+    return loaded
+
+
+def corpus_json(corpus: Corpus, refs: list[str]) -> dict:
+    """The shared corpus file: structure and strings once, one id array per translation.
+
+    "verses" lists a string index for every slot of "books" in order (book, then
+    chapter, then verse); "quotes" gives each reference as a verse-ID range.
+    """
+    books = [book for book in BOOK_FILES if book in corpus.chapter_sizes]
     quotes = []
-    for ref in all_refs:
+    for ref in refs:
+        span = corpus.resolve(ref)
+        if span:
+            quotes.append([ref, *span])
+    return {
+        "version": CORPUS_VERSION,
+        "books": [[book, BOOK_NUMBERS[book], list(corpus.chapter_sizes[book])] for book in books],
+        "translations": {
+            code: {
+                "name": TRANSLATION_NAMES.get(code, code.upper()),
+                "verses": [i for book in books for i in corpus.verse_ids(code, book)],
+            }
+            for code in corpus.verses
+        },
+        "strings": corpus.pool.strings,
+        "quotes": quotes,
+    }
+
+
+# ============================================================
+# Overlapping references
+# Curated lists nest on purpose (a verse as a short quote, its
+# passage as a long one); these find and resolve such overlaps.
+# ============================================================
+
+OVERLAP_POLICIES = ("keep", "drop-nested", "merge")
+
+
+def find_overlaps(ranges) -> tuple[list[tuple[str, int, int]], list[list[int]]]:
+    """Relate (book, chapter, start, end) ranges that share verses.
+
+    One sort plus a sweep per chapter, so O(n log n): a range is compared
+    only with the earlier range that reaches furthest. Returns
+    (relations, clusters). Each relation is (kind, i, j) with kind
+    "duplicate" (same verses as j), "nested" (inside j) or "overlap"; each
+    range gets at most one. Clusters are groups of two or more indices
+    connected by shared verses.
+    """
+    order = sorted(range(len(ranges)), key=lambda i: (ranges[i][0], ranges[i][1], ranges[i][2], -ranges[i][3]))
+    relations = []
+    clusters = []
+    reach = None
+    previous = None
+    cluster = []
+    for i in order:
+        book, chapter, start, end = ranges[i]
+        if reach is not None and ranges[reach][:2] == (book, chapter) and start <= ranges[reach][3]:
+            # Identical ranges sort next to each other, but the furthest
+            # reaching range may be an earlier, wider one
+            if ranges[previous] == ranges[i]:
+                relations.append(("duplicate", i, previous))
+            elif end <= ranges[reach][3]:
+                relations.append(("nested", i, reach))
+            else:
+                relations.append(("overlap", i, reach))
+            cluster.append(i)
+        else:
+            if len(cluster) > 1:
+                clusters.append(cluster)
+            cluster = [i]
+        if reach is None or cluster == [i] or end > ranges[reach][3]:
+            reach = i
+        previous = i
+    if len(cluster) > 1:
+        clusters.append(cluster)
+    return relations, clusters
+
+
+def resolve_overlaps(refs: list[str], policy: str = "keep") -> tuple[list[str], list[tuple[str, str, str]]]:
+    """Apply an overlap policy to a list of references.
+
+    "keep" changes nothing, "drop-nested" removes references whose verses are
+    all covered by another one, and "merge" replaces every cluster of
+    overlapping references with one spanning them all, placed where the
+    first of them was. Returns the new list and a report of
+    (kind, ref, other ref) rows.
+    """
+    parsed = [(i, parse_reference(ref)) for i, ref in enumerate(refs)]
+    parsed = [(i, p) for i, p in parsed if p]
+    relations, clusters = find_overlaps([p for _, p in parsed])
+    report = [(kind, refs[parsed[a][0]], refs[parsed[b][0]]) for kind, a, b in relations]
+
+    if policy == "drop-nested":
+        dropped = {parsed[a][0] for kind, a, _ in relations if kind != "overlap"}
+        return [ref for i, ref in enumerate(refs) if i not in dropped], report
+    if policy == "merge":
+        replaced = {}
+        for cluster in clusters:
+            members = sorted(parsed[c][0] for c in cluster)
+            book, chapter = parsed[cluster[0]][1][:2]
+            start = min(parsed[c][1][2] for c in cluster)
+            end = max(parsed[c][1][3] for c in cluster)
+            merged = format_source(book, chapter, start, end)
+            replaced[members[0]] = merged
+            replaced.update((m, None) for m in members[1:])
+            report.extend(("merged", refs[m], merged) for m in members if refs[m] != merged)
+        result = [replaced.get(i, ref) for i, ref in enumerate(refs)]
+        return [ref for ref in result if ref is not None], report
+    return refs, report
+
+
+# ============================================================
+# Balanced selection
+# Fills each length group up to a target with passages picked
+# from the whole canon, around the curated references.
+# ============================================================
+
+class CanonProfile:
+    """Verse lengths of several books laid end to end.
+
+    `offsets` continues the BookIndex prefix sums across books, so
+    offsets[j] - offsets[i] - 1 is the length of slots [i, j) joined, and
+    `chapter_of` numbers every slot's chapter globally so a range can be
+    checked to stay inside one chapter. No verse text is kept.
+    """
+
+    def __init__(self):
+        self.offsets = array("Q", [0])
+        self.chapter_of = array("I")
+        self.chapter_first = array("I")
+        self.chapters = []  # (book, chapter number) per global chapter id
+        self.first_chapter = {}  # book -> global id of its chapter 1
+
+    def add(self, book: str, index: BookIndex):
+        self.first_chapter[book] = len(self.chapters)
+        shift = self.offsets[-1]
+        self.offsets.extend(offset + shift for offset in index.offsets[1:])
+        for number, size in enumerate(index.chapter_sizes, start=1):
+            self.chapter_first.append(len(self.chapter_of))
+            self.chapter_of.extend([len(self.chapters)] * size)
+            self.chapters.append((book, number))
+
+    def slot_range(self, book: str, chapter: int, start_verse: int, end_verse: int) -> tuple[int, int] | None:
+        """Global slots [first, last) of a verse range, clipped like BookIndex.slot_range."""
+        first_chapter = self.first_chapter.get(book)
+        if first_chapter is None or chapter < 1:
+            return None
+        cid = first_chapter + chapter - 1
+        if cid >= len(self.chapters) or self.chapters[cid][0] != book:
+            return None
+        base = self.chapter_first[cid]
+        end = self.chapter_first[cid + 1] if cid + 1 < len(self.chapters) else len(self.chapter_of)
+        start_verse = max(start_verse, 1)
+        end_verse = min(end_verse, end - base)
+        if start_verse > end_verse:
+            return None
+        return base + start_verse - 1, base + end_verse
+
+    def locate(self, slot: int) -> tuple[str, int, int]:
+        """(book, chapter, verse) of a global slot."""
+        cid = self.chapter_of[slot]
+        book, chapter = self.chapters[cid]
+        return book, chapter, slot - self.chapter_first[cid] + 1
+
+
+def length_candidates(profile: CanonProfile, groups=QUOTE_GROUPS,
+                      max_verses: int = MAX_SELECTED_VERSES) -> list[list[int]]:
+    """Every run of 1..max_verses verses inside one chapter, bucketed by length group.
+
+    A run of k verses starting at slot i has length offsets[i + k] -
+    offsets[i] - 1, so each k is one pass of subtractions over the prefix
+    sums, vectorized with NumPy when it is installed. Candidates are encoded
+    as first_slot * (max_verses + 1) + k and sorted, i.e. in canon order.
+    Runs never start or end on a verse missing from the source.
+    """
+    n = len(profile.chapter_of)
+    stride = max_verses + 1
+    if numpy is not None:
+        offsets = numpy.frombuffer(profile.offsets, dtype=numpy.uint64).astype(numpy.int64)
+        chapter_of = numpy.frombuffer(profile.chapter_of, dtype=numpy.uint32)
+        present = offsets[1:] != offsets[:-1]
+        found = [[] for _ in groups]
+        for k in range(1, min(max_verses, n) + 1):
+            starts = numpy.arange(n - k + 1, dtype=numpy.int64)
+            lengths = offsets[k:] - offsets[:-k] - 1
+            inside = (chapter_of[:n - k + 1] == chapter_of[k - 1:]) & present[:n - k + 1] & present[k - 1:]
+            for g, (low, high) in enumerate(groups):
+                found[g].append(starts[inside & (lengths >= low) & (lengths <= high)] * stride + k)
+        # An empty profile has no runs at all, and concatenate() needs at least one array
+        return [numpy.sort(numpy.concatenate(parts)).tolist() if parts else [] for parts in found]
+
+    offsets, chapter_of = profile.offsets, profile.chapter_of
+    candidates = [[] for _ in groups]
+    for i in range(n):
+        chapter = chapter_of[i]
+        if offsets[i + 1] == offsets[i]:
+            continue
+        for k in range(1, min(max_verses, n - i) + 1):
+            if chapter_of[i + k - 1] != chapter:
+                break
+            if offsets[i + k] == offsets[i + k - 1]:
+                continue
+            group = length_group(offsets[i + k] - offsets[i] - 1, groups)
+            if group is not None:
+                candidates[group].append(i * stride + k)
+    return candidates
+
+
+def select_balanced(profile: CanonProfile, seeds, targets: list[int], groups=QUOTE_GROUPS,
+                    max_verses: int = MAX_SELECTED_VERSES) -> tuple[list[int], list[tuple[int, int]]]:
+    """Choose passages so that every length group holds exactly its target.
+
+    `seeds` are (group, first slot, last slot) of the curated passages in
+    priority order. Each is kept while its group has room; the rest are
+    dropped. Remaining places are filled with candidate runs that share no
+    verse with a kept seed or with each other, spread evenly over the canon,
+    longest groups first since they are the hardest to place. Returns the
+    indices of the kept seeds and the picked (first slot, last slot) ranges;
+    a group comes up short only if the canon has too few free runs for it.
+    """
+    occupied = bytearray(len(profile.chapter_of))
+    counts = [0] * len(groups)
+    kept = []
+    for i, (group, first, last) in enumerate(seeds):
+        if group is None or counts[group] >= targets[group]:
+            continue
+        counts[group] += 1
+        kept.append(i)
+        occupied[first:last] = b"\x01" * (last - first)
+
+    stride = max_verses + 1
+    candidates = length_candidates(profile, groups, max_verses)
+    picks = []
+    for group in reversed(range(len(groups))):
+        need = targets[group] - counts[group]
+        pool = candidates[group]
+        if need <= 0 or not pool:
+            continue
+        step = len(pool) / need
+        cursor = 0
+        for n in range(need):
+            cursor = max(cursor, int(n * step))
+            while cursor < len(pool):
+                first, k = divmod(pool[cursor], stride)
+                cursor += 1
+                if occupied.find(1, first, first + k) == -1:
+                    occupied[first:first + k] = b"\x01" * k
+                    picks.append((first, first + k))
+                    break
+            else:
+                break
+    picks.sort()
+    return kept, picks
+
+
+def balance_quotes(quotes: list[dict], spans: list[tuple], profile: CanonProfile, targets: list[int],
+                   cache: BookCache, source_url: str = GITHUB_RAW) -> list[dict]:
+    """Run select_balanced() over assembled quotes and return the balanced list.
+
+    `spans` holds each quote's parsed (book, chapter, start, end). Kept
+    quotes come first in their original order, then the picked passages in
+    canon order, their text read back from the book cache.
+    """
+    seeds = []
+    for quote, span in zip(quotes, spans):
+        slots = profile.slot_range(*span)
+        seeds.append((length_group(quote["length"]) if slots else None, *(slots or (0, 0))))
+    with METRICS.span("select"):
+        kept, picks = select_balanced(profile, seeds, targets)
+
+    by_book = defaultdict(list)
+    for first, last in picks:
+        book, chapter, start_verse = profile.locate(first)
+        by_book[book].append((chapter, start_verse, start_verse + last - first - 1))
+    picked = []
+    for book, ranges in by_book.items():
+        # Every book was fetched earlier in this run, so this never touches the network
+        digest = download_book(book, cache, source_url, offline=True)
+        if digest is None:
+            continue
+        index = read_book(cache, digest)
+        for chapter, start_verse, end_verse in ranges:
+            text = index.passage(chapter, start_verse, end_verse)
+            picked.append({
+                "text": text,
+                "source": format_source(book, chapter, start_verse, end_verse),
+                "length": js_length(text),
+            })
+
+    result = [quotes[i] for i in kept] + picked
+    METRICS.count("refs.balance.dropped", len(quotes) - len(kept))
+    METRICS.count("quotes.balance.picked", len(picked))
+    print(f"\nBalanced to {targets} ({len(quotes) - len(kept)} curated dropped, {len(picked)} picked):")
+    for group, (low, high) in enumerate(QUOTE_GROUPS):
+        curated = sum(1 for i in kept if seeds[i][0] == group)
+        total = sum(1 for q in result if length_group(q["length"]) == group)
+        short = f", {targets[group] - total} short of target" if total < targets[group] else ""
+        print(f"  {low}-{high} chars: {curated} curated + {total - curated} picked{short}")
+    return result
+
+
+# ============================================================
+# Incremental builds
+# ============================================================
+
+def list_hash(refs) -> str:
+    return hashlib.sha256("\n".join(refs).encode("utf-8")).hexdigest()
+
+
+def empty_manifest() -> dict:
+    return {"generator": GENERATOR_VERSION, "categories": {}, "books": {}}
+
+
+def load_manifest(path: str) -> dict:
+    """Load the previous build's manifest, or an empty one if it is missing or stale."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest()
+    if manifest.get("generator") != GENERATOR_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class RefStore:
+    """Extracted reference texts, kept in SQLite next to the build manifest.
+
+    Each run writes a new database to a temp file with the previous one
+    attached, so a reference whose book is unchanged has its text copied
+    across instead of extracted again, and nothing is held in memory. Like
+    SqliteExport, the temp file only replaces `path` on commit(); used as a
+    context manager, a run that stops before then leaves `path` as it was.
+    """
+
+    def __init__(self, path: str, reuse: bool = True):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.finished = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE refs (ref TEXT PRIMARY KEY, book TEXT NOT NULL, text TEXT)")
+        self.previous = reuse and os.path.exists(path)
+        if self.previous:
+            self.conn.execute("ATTACH DATABASE ? AS previous", (path,))
+            try:
+                version = self.conn.execute("PRAGMA previous.user_version").fetchone()[0]
+                self.conn.execute("SELECT 1 FROM previous.refs LIMIT 1")
+            except sqlite3.DatabaseError:
+                version = None
+            if version != GENERATOR_VERSION:
+                self.conn.execute("DETACH DATABASE previous")
+                self.previous = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.finished:
+            self.abort()
+        return False
+
+    def abort(self):
+        """Close the database and delete the temp file, leaving `path` as it was."""
+        self.conn.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+    def reuse(self, ref: str, book_hash: str) -> bool:
+        """Copy the last build's text for `ref` if it came from this same book."""
+        if not self.previous:
+            return False
+        cursor = self.conn.execute("INSERT INTO refs SELECT ref, book, text FROM previous.refs "
+                                   "WHERE ref = ? AND book = ?", (ref, book_hash))
+        return cursor.rowcount > 0
+
+    def add(self, rows):
+        """Store (ref, book hash, text) rows; text is None for verses not found."""
+        self.conn.executemany("INSERT INTO refs VALUES (?, ?, ?)", rows)
+
+    def get(self, ref: str) -> str | None:
+        row = self.conn.execute("SELECT text FROM refs WHERE ref = ?", (ref,)).fetchone()
+        return row[0] if row else None
+
+    def commit(self):
+        """Close the database and move it into place for the next run."""
+        self.conn.execute(f"PRAGMA user_version = {GENERATOR_VERSION}")
+        self.conn.commit()
+        if self.previous:
+            self.conn.execute("DETACH DATABASE previous")
+        self.conn.close()
+        self.finished = True
+        os.replace(self.tmp, self.path)
+
+
+def id_ledger_path(output: str) -> str:
+    """The tracked ledger for a quotes file in the repo, or one next to it elsewhere."""
+    if is_within(output, REPO_ROOT):
+        return ID_LEDGER_PATH
+    return f"{os.path.splitext(output)[0]}.ids.json"
+
+
+def quotes_key(path: str) -> str:
+    """A quotes file's key in its ledger: repo-relative in the repo, otherwise its name."""
+    path = os.path.abspath(path)
+    if is_within(path, REPO_ROOT):
+        return os.path.relpath(path, REPO_ROOT).replace(os.sep, "/")
+    return os.path.basename(path)
+
+
+def load_id_ledger(output: str) -> dict:
+    """Every source -> id ever issued in a quotes file, including dropped quotes."""
+    try:
+        with open(id_ledger_path(output), encoding="utf-8") as f:
+            return json.load(f).get(quotes_key(output), {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_id_ledger(output: str, ids: dict) -> bool:
+    """Record a quotes file's ids, ordered by id, next to those of other files."""
+    path = id_ledger_path(output)
+    try:
+        with open(path, encoding="utf-8") as f:
+            ledger = json.load(f)
+    except (OSError, ValueError):
+        ledger = {}
+    ledger[quotes_key(output)] = dict(sorted(ids.items(), key=lambda item: item[1]))
+    return write_text(path, format_json(dict(sorted(ledger.items())), expand_depth=2))
+
+
+def unique_references(categories) -> list[str]:
+    """Every reference of the (name, list) categories once, in first-seen order."""
+    return list(dict.fromkeys(ref for _, category in categories for ref in category))
+
+
+def assemble_quotes(refs: list[str], texts, loaded, failed: list[str], skip_identical: bool = False):
+    """Turn extracted texts into quote records, reporting every reference left out.
+
+    `texts` maps references to their extracted text (a dict or a RefStore)
+    and `loaded` is the set of books that could be read. Yields (ref, parsed
+    reference, quote) for each reference that makes it, in order, and appends
+    the references that could not be resolved to `failed`. Skipping a copy
+    of another quote's text is not a failure.
+    """
+    # Digests rather than texts, so this stays small on big reference lists
+    first_with_text = {}
+    for ref in refs:
         parsed = parse_reference(ref)
         if not parsed:
             print(f"  SKIP (bad format): {ref}", file=sys.stderr)
+            METRICS.count("refs.skipped.bad_format")
+            failed.append(ref)
             continue
 
         book, chapter, start_v, end_v = parsed
-        book_data = book_cache.get(book)
-        if not book_data:
+        if book not in loaded:
             print(f"  SKIP (no book data): {ref}", file=sys.stderr)
+            METRICS.count("refs.skipped.no_book_data")
+            failed.append(ref)
             continue
 
-        text = extract_verses(book_data, chapter, start_v, end_v)
+        text = texts.get(ref)
         if not text:
             print(f"  SKIP (verses not found): {ref}", file=sys.stderr)
+            METRICS.count("refs.skipped.verses_not_found")
+            failed.append(ref)
             continue
 
-        source = format_source(book, chapter, start_v, end_v)
-        quotes.append({
+        # Different references can still read the same (parallel passages, refrains)
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        original = first_with_text.setdefault(digest, ref)
+        if original != ref:
+            METRICS.count("refs.overlaps.identical_text")
+            if skip_identical:
+                print(f"  SKIP (same text as {original}): {ref}", file=sys.stderr)
+                METRICS.count("refs.skipped.identical_text")
+                continue
+            print(f"  IDENTICAL {ref} ~ {original}", file=sys.stderr)
+
+        yield ref, parsed, {
             "text": text,
-            "source": source,
-            "length": len(text),
-        })
+            "source": format_source(book, chapter, start_v, end_v),
+            "length": js_length(text),
+        }
+
+
+class QuoteSpool:
+    """Quote records spooled to a temp file as JSON lines, so the later stages
+    can each read them back in turn without the run holding them all."""
+
+    def __init__(self, quotes=()):
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.count = 0
+        for quote in quotes:
+            self.add(quote)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        self.file.seek(0)
+        for line in self.file:
+            yield json.loads(line)
+
+    def add(self, quote: dict):
+        self.file.write(json.dumps(quote, ensure_ascii=False) + "\n")
+        self.count += 1
+
+
+def incomplete_build(missing_books, failed_refs: list[str], quotes: int) -> str | None:
+    """Why a run's quotes must not be written, or None if they are complete.
+
+    A partial run would overwrite the quotes file with fewer quotes, and the
+    ones it lost would get new ids when they came back.
+    """
+    reasons = []
+    if missing_books:
+        names = sorted(missing_books)
+        shown = ", ".join(names[:5]) + (", ..." if len(names) > 5 else "")
+        reasons.append(f"{len(names)} books could not be loaded ({shown})")
+    if failed_refs:
+        reasons.append(f"{len(failed_refs)} references could not be resolved")
+    if not quotes:
+        reasons.append("no quotes were extracted")
+    return "; ".join(reasons) or None
+
+
+def bible_book_json(book: str, index: BookIndex, first: int = 1, last: int | None = None) -> dict:
+    """The {name, chapters: {ch: [{v, t}]}} layout bible-controller.ts loads,
+    optionally for chapters first..last only."""
+    chapters = {}
+    last = len(index.chapter_sizes) if last is None else last
+    for chapter in range(first, last + 1):
+        verses = index.chapter_verses(chapter)
+        if verses:
+            chapters[str(chapter)] = [{"v": n, "t": t} for n, t in enumerate(verses, start=1) if t]
+    return {"name": book_display_name(book), "chapters": chapters}
+
+
+def chunk_passages(verses: list[tuple[int, str]]) -> list[tuple[int, int, int]]:
+    """(verseStart, verseEnd, length) of every passage the frontend chunks a
+    chapter's (verse number, text) list into, as chunkPassages() does: runs of
+    PASSAGE_CHUNK_SIZES consecutive entries, joined with spaces. A list shorter
+    than a chunk size yields the same passage again for each such size."""
+    lengths = [js_length(text) for _, text in verses]
+    chunks = []
+    for chunk in PASSAGE_CHUNK_SIZES:
+        for i in range(0, len(verses), chunk):
+            end = min(i + chunk, len(verses))
+            length = sum(lengths[i:end]) + end - i - 1
+            if length >= MIN_PASSAGE_LENGTH:
+                chunks.append((verses[i][0], verses[end - 1][0], length))
+    return chunks
+
+
+def passage_rows(index: BookIndex) -> list[tuple[int, int, int, int]]:
+    """Sorted, distinct (chapter, verseStart, verseEnd, length) for every passage
+    the frontend would chunk a book into."""
+    rows = set()
+    for chapter in range(1, len(index.chapter_sizes) + 1):
+        verses = [(n, text) for n, text in enumerate(index.chapter_verses(chapter), start=1) if text]
+        rows.update((chapter, *passage) for passage in chunk_passages(verses))
+    return sorted(rows)
+
+
+def passage_index_json(index: BookIndex) -> dict:
+    """Every passage the frontend would chunk a book into, bucketed by length group.
+
+    Each group is a flat [chapter, verseStart, verseEnd, length, ...] array, so
+    the client picks a row straight from the groups it wants and only builds
+    the text of the passage it actually uses.
+    """
+    groups = [[] for _ in QUOTE_GROUPS]
+    for row in passage_rows(index):
+        group = length_group(row[3])
+        if group is not None:
+            groups[group].extend(row)
+    return {"groups": QUOTE_GROUPS, "passages": groups}
+
+
+def chapter_shards(index: BookIndex, target_size: int = SHARD_SIZE) -> list[tuple[int, int]]:
+    """Split a book into (first, last) runs of whole chapters with about
+    `target_size` characters of verse text each; a long chapter stands alone."""
+    shards = []
+    first = 1
+    size = 0
+    for chapter in range(1, len(index.chapter_sizes) + 1):
+        start = index.chapter_starts[chapter - 1]
+        length = index.offsets[start + index.chapter_sizes[chapter - 1]] - index.offsets[start]
+        if size and size + length > target_size:
+            shards.append((first, chapter - 1))
+            first = chapter
+            size = 0
+        size += length
+    if index.chapter_sizes:
+        shards.append((first, len(index.chapter_sizes)))
+    return shards
+
+
+def in_verse_runs(runs: list[int], verse: int) -> bool:
+    """Whether a verse_runs() list includes the verse (inVerseRuns in the frontend)."""
+    for i in range(0, len(runs), 2):
+        if runs[i] > verse:
+            return False
+        if verse <= runs[i + 1]:
+            return True
+    return False
+
+
+def shard_json(book: str, index: BookIndex, passages: dict, first: int, last: int) -> dict:
+    """A bible_book_json() slice plus the passage index rows of its chapters."""
+    rows = []
+    for group in passages["passages"]:
+        rows.append([value for i in range(0, len(group), 4) if first <= group[i] <= last
+                     for value in group[i:i + 4]])
+    return {**bible_book_json(book, index, first, last), "passages": rows}
+
+
+def shard_entry(slug: str, shard: dict, first: int, last: int, size: int, theme_runs: dict) -> dict:
+    """The shards.json record for one shard: where it is, how big, and how many
+    passages it offers per length group, overall and inside each theme.
+
+    A theme's passages are chunked from just the theme's verses of each
+    chapter, the way the frontend picks themed passages.
+    """
+    themes = {}
+    for theme, chapters in theme_runs.items():
+        counts = [0] * len(QUOTE_GROUPS)
+        for chapter, verses in shard["chapters"].items():
+            runs = chapters.get(chapter)
+            if runs is None:
+                continue
+            themed = [(v["v"], v["t"]) for v in verses if in_verse_runs(runs, v["v"])]
+            for _, _, length in chunk_passages(themed):
+                group = length_group(length)
+                if group is not None:
+                    counts[group] += 1
+        if any(counts):
+            themes[theme] = counts
+    return {
+        "book": slug,
+        "file": f"{slug}-{first}-{last}.json",
+        "chapters": [first, last],
+        "size": size,
+        "counts": [len(group) // 4 for group in shard["passages"]],
+        "themes": themes,
+    }
+
+
+def prune_shards(shard_dir: str, keep: set) -> int:
+    """Delete shard files (and compressed siblings) not listed in `keep`."""
+    removed = 0
+    for name in os.listdir(shard_dir):
+        base = name.removesuffix(".gz").removesuffix(".br")
+        # Content-hashed copies are publish()'s to clean up
+        if base.endswith(".json") and base not in keep and not is_hashed_name(name):
+            os.remove(os.path.join(shard_dir, name))
+            removed += 1
+    return removed
+
+
+def books_json(books) -> list:
+    new_testament = BOOK_NUMBERS[NEW_TESTAMENT_START]
+    return [{"id": BOOK_NUMBERS[book], "name": book_display_name(book),
+             "testament": "NT" if BOOK_NUMBERS[book] >= new_testament else "OT"}
+            for book in BOOK_FILES if book in books]
+
+
+def verse_runs(spans) -> list[int]:
+    """Merge inclusive (first, last) verse spans into a flat, sorted
+    [first, last, first, last, ...] list; touching spans become one run."""
+    runs = []
+    for first, last in sorted(spans):
+        if runs and first <= runs[-1] + 1:
+            runs[-1] = max(runs[-1], last)
+        else:
+            runs += [first, last]
+    return runs
+
+
+def theme_spans(index: BookIndex, chapter: int | None, start_verse: int, end_verse: int) -> list[tuple]:
+    """(chapter, first verse, last verse) per chapter a parse_theme_reference() result covers."""
+    chapters = [chapter] if chapter is not None else range(1, len(index.chapter_sizes) + 1)
+    spans = []
+    for number in chapters:
+        slots = index.slot_range(number, start_verse, end_verse)
+        if slots is not None:
+            base = index.chapter_starts[number - 1]
+            spans.append((str(number), slots[0] - base + 1, slots[1] - base))
+    return spans
+
+
+def themes_json(resolved: dict, themes_lists: dict = THEMES) -> dict:
+    """Assemble theme -> book slug -> chapter -> verse runs in THEMES order.
+
+    Runs (see verse_runs) keep the file small however much of the canon a
+    theme covers, and since they are merged a passage belongs to a theme
+    exactly when a single run spans it.
+    """
+    themes = {}
+    for theme, refs in themes_lists.items():
+        books = {}
+        for i in range(len(refs)):
+            hit = resolved.get((theme, i))
+            if hit is None:
+                continue
+            slug, spans = hit
+            chapters = books.setdefault(slug, {})
+            for chapter, first, last in spans:
+                chapters.setdefault(chapter, []).append((first, last))
+        themes[theme] = {
+            slug: {chapter: verse_runs(spans) for chapter, spans in chapters.items()}
+            for slug, chapters in books.items()
+        }
+    return themes
+
+
+# ============================================================
+# SQLite export
+# The whole corpus in one indexed database, so a server can
+# pick or search passages without loading any JSON.
+# ============================================================
+
+SQLITE_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE length_groups (
+    id INTEGER PRIMARY KEY,
+    min_length INTEGER NOT NULL,
+    max_length INTEGER NOT NULL
+);
+CREATE TABLE books (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    testament TEXT NOT NULL,
+    chapters INTEGER NOT NULL
+);
+-- id is verse_id(), BBCCCVVV, so a chapter's verses are one id range
+CREATE TABLE verses (
+    id INTEGER PRIMARY KEY,
+    book INTEGER NOT NULL REFERENCES books (id),
+    chapter INTEGER NOT NULL,
+    verse INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE TABLE passages (
+    id INTEGER PRIMARY KEY,
+    first_verse INTEGER NOT NULL REFERENCES verses (id),
+    last_verse INTEGER NOT NULL REFERENCES verses (id),
+    length INTEGER NOT NULL,
+    length_group INTEGER NOT NULL REFERENCES length_groups (id)
+);
+-- Merged runs of verses per theme, never crossing a chapter
+CREATE TABLE themes (
+    theme TEXT NOT NULL,
+    first_verse INTEGER NOT NULL,
+    last_verse INTEGER NOT NULL,
+    PRIMARY KEY (theme, first_verse)
+) WITHOUT ROWID;
+CREATE TABLE quotes (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    length_group INTEGER REFERENCES length_groups (id),
+    first_verse INTEGER,
+    last_verse INTEGER
+);
+"""
+# Built after the bulk inserts, which is much faster than maintaining them
+SQLITE_INDEXES = """
+CREATE UNIQUE INDEX verses_location ON verses (book, chapter, verse);
+CREATE INDEX passages_group ON passages (length_group, first_verse);
+CREATE INDEX quotes_group ON quotes (length_group);
+"""
+SQLITE_FTS = """
+CREATE VIRTUAL TABLE verses_fts USING fts5 (text, content = 'verses', content_rowid = 'id');
+INSERT INTO verses_fts (verses_fts) VALUES ('rebuild');
+"""
+
+
+def sqlite_has_fts5(conn: sqlite3.Connection) -> bool:
+    return any(row[0] == "ENABLE_FTS5" for row in conn.execute("PRAGMA compile_options"))
+
+
+class SqliteExport:
+    """Builds the SQLite database a book at a time, then swaps it into place.
+
+    Random passage by length group and theme:
+
+        SELECT p.* FROM themes t JOIN passages p
+          ON p.first_verse BETWEEN t.first_verse AND t.last_verse AND p.last_verse <= t.last_verse
+        WHERE t.theme = ? AND p.length_group = ? ORDER BY random() LIMIT 1
+
+    Full-text verse search:
+
+        SELECT v.* FROM verses_fts JOIN verses v ON v.id = verses_fts.rowid
+        WHERE verses_fts MATCH ? ORDER BY rank
+
+    The database is written to a temp file next to `path`, which only replaces
+    it when the contents differ, like AtomicFile. Used as a context manager,
+    the temp file is removed if the build stops before finish().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.finished = False
+        self.chapter_sizes = {}
+        self.themes = defaultdict(lambda: defaultdict(list))  # theme -> (book, chapter) -> spans
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.executemany("INSERT INTO length_groups VALUES (?, ?, ?)",
+                              [(i, low, high) for i, (low, high) in enumerate(QUOTE_GROUPS)])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.finished:
+            self.abort()
+        return False
+
+    def abort(self):
+        """Close the database and delete the temp file, leaving `path` as it was."""
+        self.conn.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+    def add_book(self, book: str, index: BookIndex):
+        number = BOOK_NUMBERS[book]
+        self.chapter_sizes[book] = index.chapter_sizes
+        testament = "NT" if number >= BOOK_NUMBERS[NEW_TESTAMENT_START] else "OT"
+        self.conn.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?)",
+                          (number, book_display_name(book), book_slug(book), testament, len(index.chapter_sizes)))
+        self.conn.executemany("INSERT INTO verses VALUES (?, ?, ?, ?, ?)", (
+            (verse_id(book, chapter, verse), number, chapter, verse, text)
+            for chapter in range(1, len(index.chapter_sizes) + 1)
+            for verse, text in enumerate(index.chapter_verses(chapter), start=1) if text
+        ))
+        self.conn.executemany(
+            "INSERT INTO passages (first_verse, last_verse, length, length_group) VALUES (?, ?, ?, ?)",
+            ((verse_id(book, chapter, start), verse_id(book, chapter, end), length, length_group(length))
+             for chapter, start, end, length in passage_rows(index) if length_group(length) is not None),
+        )
+
+    def add_theme(self, theme: str, book: str, spans: list[tuple]):
+        """Record theme_spans() output; runs are merged when the export finishes."""
+        for chapter, first, last in spans:
+            self.themes[theme][book, int(chapter)].append((first, last))
+
+    def add_quotes(self, quotes, ids: dict):
+        """Quotes as assembled for english.json, with their ids there by source."""
+        self.conn.executemany("INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            (ids.get(quote["source"]), quote["source"], quote["text"], quote["length"],
+             length_group(quote["length"]), *self._quote_span(quote["source"]))
+            for quote in quotes
+        ))
+
+    def _quote_span(self, source: str) -> tuple[int | None, int | None]:
+        parsed = parse_reference(source)
+        if parsed and parsed[0] in self.chapter_sizes:
+            book, chapter, start_verse, end_verse = parsed
+            sizes = self.chapter_sizes[book]
+            if 1 <= chapter <= len(sizes):
+                end_verse = min(end_verse, sizes[chapter - 1])
+                return verse_id(book, chapter, start_verse), verse_id(book, chapter, end_verse)
+        return None, None
+
+    def finish(self) -> bool:
+        """Index, close and move the database into place. Returns whether it changed."""
+        for theme, chapters in self.themes.items():
+            for (book, chapter), spans in sorted(chapters.items(), key=lambda item: (BOOK_NUMBERS[item[0][0]], item[0][1])):
+                runs = verse_runs(spans)
+                self.conn.executemany("INSERT INTO themes VALUES (?, ?, ?)", [
+                    (theme, verse_id(book, chapter, first), verse_id(book, chapter, last))
+                    for first, last in zip(runs[::2], runs[1::2])
+                ])
+        self.conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("generator_version", str(GENERATOR_VERSION)),
+            ("translation", PRIMARY_TRANSLATION),
+        ])
+        self.conn.executescript(SQLITE_INDEXES)
+        if sqlite_has_fts5(self.conn):
+            self.conn.executescript(SQLITE_FTS)
+        else:
+            print("  WARNING: this sqlite3 has no FTS5, leaving out verses_fts", file=sys.stderr)
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        self.conn.close()
+        self.finished = True
+
+        if file_sha256(self.tmp) == file_sha256(self.path):
+            os.remove(self.tmp)
+            return False
+        os.replace(self.tmp, self.path)
+        return True
+
+
+# ============================================================
+# Watch mode
+# ============================================================
+
+def load_reference_lists(path: str) -> tuple[list, dict]:
+    """CATEGORIES and THEMES as they are currently written in `path`."""
+    spec = importlib.util.spec_from_file_location("_reference_lists", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.CATEGORIES, module.THEMES
+
+
+class Watcher:
+    """Keeps book indexes and extracted texts in memory between rebuilds.
+
+    Each refresh() resolves only references it has not seen before (loading
+    a book the first time one needs it) and rewrites the quotes file, and
+    themes.json with --full, only if the content changed. Writes go through
+    AtomicFile, so a dev server never serves a half-written file.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.cache = BookCache(args.cache_dir)
+        self.indexes = {}  # book -> BookIndex, or None if it could not be read
+        self.texts = {}  # reference -> extracted text
+
+    def load_books(self, books):
+        missing = [book for book in books if book not in self.indexes]
+        order = [book for book in BOOK_FILES if book in missing] + sorted(set(missing) - set(BOOK_FILES))
+        for book, digest in iter_books(order, self.cache, self.args.source_url, self.args.offline, self.args.workers):
+            self.indexes[book] = None
+            if digest is not None:
+                self.indexes[book] = read_book(self.cache, digest)
+
+    def refresh(self, categories: list, themes: dict) -> str:
+        """Rebuild from the given lists. Returns a one-line summary."""
+        args = self.args
+        refs, _ = resolve_overlaps(unique_references(categories), args.overlaps)
+        parsed = {ref: parse_reference(ref) for ref in refs}
+        theme_parsed = {}
+        if args.full:
+            theme_parsed = {(theme, i): parse_theme_reference(ref)
+                            for theme, theme_refs in themes.items() for i, ref in enumerate(theme_refs)}
+        self.load_books({p[0] for p in [*parsed.values(), *theme_parsed.values()] if p})
+
+        fresh = [ref for ref, p in parsed.items() if p and ref not in self.texts and self.indexes.get(p[0])]
+        for ref in fresh:
+            book, chapter, start_v, end_v = parsed[ref]
+            self.texts[ref] = extract_verses(self.indexes[book], chapter, start_v, end_v)
+        self.texts = {ref: self.texts[ref] for ref in refs if ref in self.texts}
+
+        loaded = {book for book, index in self.indexes.items() if index is not None}
+        failed = []
+        quotes = [quote for _, _, quote in assemble_quotes(refs, self.texts, loaded, failed,
+                                                           skip_identical=args.overlaps != "keep")]
+        missing = {p[0] for p in [*parsed.values(), *theme_parsed.values()] if p} - loaded
+        problem = incomplete_build(missing, failed, len(quotes))
+        if problem:
+            return f"not rebuilding: {problem}"
+        writer = OutputWriter(args.format, args.compress)
+        changed = []
+        ledger = load_id_ledger(args.output)
+        written, ids = write_quotes(writer, args.output, args.language, quotes, ledger)
+        if written:
+            changed.append(os.path.basename(args.output))
+        save_id_ledger(args.output, {**ledger, **ids})
+        if args.full:
+            resolved = {}
+            for key, p in theme_parsed.items():
+                index = self.indexes.get(p[0]) if p else None
+                spans = theme_spans(index, *p[1:]) if index else []
+                if spans:
+                    resolved[key] = (book_slug(p[0]), spans)
+            if writer.write_json(os.path.join(args.bible_dir, "themes.json"), themes_json(resolved, themes),
+                                 expand_depth=99):
+                changed.append("themes.json")
+        return (f"{len(fresh)} references resolved, {len(quotes)} quotes, "
+                f"{'rewrote ' + ' and '.join(changed) if changed else 'no changes'}")
+
+
+def watch(args) -> int:
+    """Rebuild whenever this script (and so its reference lists) changes, until Ctrl+C."""
+    path = os.path.abspath(__file__)
+    watcher = Watcher(args)
+    stamp = None
+    print(f"Watching {path} for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:  # editors that save by rename leave a brief gap
+                current = stamp
+            if current != stamp:
+                stamp = current
+                started = time.perf_counter()
+                try:
+                    categories, themes = load_reference_lists(path)
+                except Exception as e:  # a half-finished edit; wait for the next save
+                    print(f"  Not rebuilding, the script does not load: {type(e).__name__}: {e}", file=sys.stderr)
+                else:
+                    summary = watcher.refresh(categories, themes)
+                    elapsed = time.perf_counter() - started
+                    print(f"[{time.strftime('%H:%M:%S')}] {summary} in {elapsed * 1000:.0f} ms")
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        watcher.cache.save()
+    return 0
+
+
+# ============================================================
+# Command line
+# ============================================================
+
+def parse_size(text: str) -> int:
+    """Parse a byte count like '180000', '200K' or '5.5M'."""
+    units = {"K": 1024, "M": 1024 * 1024}
+    text = text.strip().upper().removesuffix("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def parse_targets(text: str) -> list[int]:
+    """Per-group counts for --balance: one number for every group, or one per group."""
+    counts = [int(n) for n in text.split(",")]
+    if len(counts) == 1:
+        counts *= len(QUOTE_GROUPS)
+    if len(counts) != len(QUOTE_GROUPS) or min(counts) < 0:
+        raise argparse.ArgumentTypeError(f"expected 1 or {len(QUOTE_GROUPS)} non-negative counts")
+    return counts
+
+
+def parse_translation(text: str) -> tuple[str, str]:
+    """An extra --translation source: a code and the base URL of its book files."""
+    code, sep, url = text.partition("=")
+    if not sep or not code or not url:
+        raise argparse.ArgumentTypeError(f"expected CODE=URL, got {text!r}")
+    return code.lower(), url.rstrip("/")
+
+
+def is_within(path: str, root: str) -> bool:
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Monkeytype quotes from the KJV Bible.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for the on-disk book cache")
+    parser.add_argument("--offline", action="store_true",
+                        help="read books from the cache only, never touch the network")
+    parser.add_argument("--source-url", default=GITHUB_RAW,
+                        help="base URL the book JSON files are fetched from")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS,
+                        help="number of concurrent downloads")
+    parser.add_argument("--full", action="store_true",
+                        help="also write bible/<slug>.json for every book, books.json and themes.json")
+    parser.add_argument("--bible-dir", default=BIBLE_DIR,
+                        help="output directory for --full")
+    parser.add_argument("--index-dir", metavar="DIR",
+                        help="instead of a normal run, write passage indexes (DIR/passages/) for the "
+                             "bible_book_json() files in DIR and split them into chapter-range shards "
+                             "(DIR/shards/) listed in DIR/shards.json; the frontend build runs this on "
+                             "dist/bible")
+    parser.add_argument("--shard-size", type=parse_size, default=SHARD_SIZE,
+                        help="verse text per shard with --index-dir, e.g. 16K (default)")
+    parser.add_argument("--output", default=QUOTES_PATH,
+                        help="quotes file to write (default: frontend/static/quotes/english.json)")
+    parser.add_argument("--language", default="english",
+                        help="language value of the quotes file")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-extract every reference instead of reusing texts from the last build")
+    parser.add_argument("--format", choices=OutputWriter.FORMATS, default="pretty",
+                        help="output layout (default: pretty, as committed); the frontend cannot read "
+                             "columnar, so it needs --output and --bible-dir outside frontend/static")
+    parser.add_argument("--compress", action="store_true",
+                        help="also write precompressed .gz (and .br with brotli installed) files")
+    parser.add_argument("--publish", action="store_true",
+                        help="also write content-hashed copies of every output and map them in "
+                             "frontend/static/asset-manifest.json, removing stale ones (local only: "
+                             "the frontend build does not deploy them yet)")
+    parser.add_argument("--static-dir", default=STATIC_DIR,
+                        help="root the --publish manifest and its paths are relative to")
+    parser.add_argument("--max-file-size", type=parse_size,
+                        help="fail if any file is larger than this gzipped, e.g. 200K")
+    parser.add_argument("--max-total-size", type=parse_size,
+                        help="fail if all files together are larger than this gzipped, e.g. 2M")
+    parser.add_argument("--overlaps", choices=OVERLAP_POLICIES, default="keep",
+                        help="what to do with references that share verses: keep them all (default), "
+                             "drop those nested in another, or merge each overlapping cluster into one")
+    parser.add_argument("--balance", metavar="COUNTS", type=parse_targets,
+                        help="fill the length groups to exactly these counts (one for all, or one per "
+                             "group, e.g. 200,200,150,50), keeping curated references first and "
+                             "picking the rest from the whole canon")
+    parser.add_argument("--corpus", metavar="PATH",
+                        help="also write every translation into one shared corpus file (verse ids, "
+                             "interned text) at PATH")
+    parser.add_argument("--translation", metavar="CODE=URL", type=parse_translation, action="append", default=[],
+                        help="add a translation in the aruljohn/Bible-kjv layout to the --corpus file; repeatable")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="also export verses, passages, themes and quotes to an indexed SQLite "
+                             "database (with FTS5 search when available) at PATH")
+    parser.add_argument("--features", metavar="PATH",
+                        help="also write per-quote typing-difficulty features (punctuation, capitals, "
+                             "word length, rare character pairs, non-ASCII) as a side table at PATH")
+    parser.add_argument("--watch", action="store_true",
+                        help="stay running and rebuild the quotes file (and themes.json with --full) "
+                             "whenever the reference lists in this script are saved")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write stage timings, counters and byte totals as JSON")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write stage spans in Chrome trace-event format")
+    args = parser.parse_args(argv)
+    if args.watch:
+        for option in ("index_dir", "balance", "publish", "corpus", "sqlite", "features"):
+            if getattr(args, option):
+                parser.error(f"--watch cannot be combined with --{option.replace('_', '-')}")
+    if args.format == "columnar":
+        # The frontend reads lists of records, so columnar files must not replace the served ones
+        if args.publish:
+            parser.error("--format columnar cannot be combined with --publish")
+        live = [("--output", args.output)] + ([("--bible-dir", args.bible_dir)] if args.full else [])
+        for option, path in live:
+            if is_within(path, STATIC_DIR):
+                parser.error(f"--format columnar needs {option} outside {os.path.relpath(STATIC_DIR, REPO_ROOT)}/")
+    if args.translation and not args.corpus:
+        parser.error("--translation needs --corpus")
+    codes = [PRIMARY_TRANSLATION] + [code for code, _ in args.translation]
+    if len(set(codes)) != len(codes):
+        parser.error(f"translation codes must be unique ({PRIMARY_TRANSLATION} is --source-url)")
+    return args
+
+
+CATEGORIES = [
+    ("Genesis", GENESIS),
+    ("Psalms", PSALMS),
+    ("Proverbs", PROVERBS),
+    ("Words of Jesus", WORDS_OF_JESUS),
+    ("Other Popular", OTHER_POPULAR),
+]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.watch:
+        return watch(args)
+    if args.index_dir:
+        return build_index(args)
+    with ExitStack() as stack:
+        return build(args, stack)
+
+
+def build(args, stack: ExitStack) -> int:
+    """One full run; `stack` cleans up partial outputs if it fails."""
+    manifest_path = os.path.join(args.cache_dir, MANIFEST_NAME)
+    previous = empty_manifest() if args.rebuild else load_manifest(manifest_path)
+    manifest = empty_manifest()
+    writer = OutputWriter(args.format, args.compress)
+
+    for n, (category_name, category) in enumerate(CATEGORIES, start=1):
+        digest = list_hash(category)
+        manifest["categories"][category_name] = digest
+        changed = "" if previous["categories"].get(category_name) == digest else " [changed]"
+        unique = len(unique_references(CATEGORIES[:n]))
+        print(f"  {category_name}: {len(category)} refs ({unique} unique total){changed}")
+    all_refs = unique_references(CATEGORIES)
+
+    print(f"\nTotal unique references: {len(all_refs)}")
+
+    all_refs, overlaps = resolve_overlaps(all_refs, args.overlaps)
+    kinds = Counter(kind for kind, _, _ in overlaps)
+    for kind, count in sorted(kinds.items()):
+        METRICS.count(f"refs.overlaps.{kind}", count)
+    if overlaps:
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items()))
+        print(f"Overlapping references ({args.overlaps}): {summary}")
+        for kind, ref, other in overlaps:
+            print(f"  {kind.upper():<9} {ref} ~ {other}", file=sys.stderr)
+        if args.overlaps != "keep":
+            print(f"References after resolving overlaps: {len(all_refs)}")
+
+    # Group references by the book they need
+    refs_by_book = defaultdict(list)
+    for ref in all_refs:
+        parsed = parse_reference(ref)
+        if parsed:
+            refs_by_book[parsed[0]].append((ref, parsed))
+    theme_refs_by_book = defaultdict(list)
+    if args.full or args.sqlite:
+        for theme, refs in THEMES.items():
+            for i, ref in enumerate(refs):
+                parsed = parse_theme_reference(ref)
+                if parsed:
+                    theme_refs_by_book[parsed[0]].append(((theme, i), parsed))
+                else:
+                    print(f"  SKIP theme {theme} (bad format): {ref}", file=sys.stderr)
+                    METRICS.count("themes.skipped.bad_format")
+
+    books_needed = set(refs_by_book) | set(theme_refs_by_book)
+    if args.full or args.balance or args.corpus or args.sqlite:
+        books_needed |= set(BOOK_FILES)
+    order = list(BOOK_FILES) + sorted(books_needed - set(BOOK_FILES))
+    print(f"Books to load: {len(books_needed)}\n")
+
+    # Stream the books one at a time: extract what each one is needed for,
+    # write its whole-canon file in --full mode, then let it go
+    cache = BookCache(args.cache_dir)
+    texts = stack.enter_context(RefStore(os.path.join(args.cache_dir, REF_STORE_NAME), reuse=not args.rebuild))
+    loaded = set()
+    profile = CanonProfile()
+    corpus = Corpus() if args.corpus else None
+    export = stack.enter_context(SqliteExport(args.sqlite)) if args.sqlite else None
+    resolved_themes = {}
+    reused = 0
+    written = 0
+    for book, book_hash in iter_books([b for b in order if b in books_needed], cache,
+                                      args.source_url, args.offline, args.workers):
+        if book_hash is None:
+            continue
+        loaded.add(book)
+        manifest["books"][book] = book_hash
+
+        # References whose book is unchanged since the last build keep their text
+        pending = []
+        for ref, parsed in refs_by_book.get(book, []):
+            if texts.reuse(ref, book_hash):
+                reused += 1
+            else:
+                pending.append((ref, parsed))
+        METRICS.count("refs.reused", len(refs_by_book.get(book, [])) - len(pending))
+        METRICS.count("refs.extracted", len(pending))
+        if not pending and book not in theme_refs_by_book and not args.full and not args.balance and not corpus and not export:
+            continue
+
+        with METRICS.span("index", book=book):
+            index = read_book(cache, book_hash)
+        if args.balance:
+            profile.add(book, index)
+        if corpus is not None:
+            corpus.add(PRIMARY_TRANSLATION, book, index)
+        if export is not None:
+            with METRICS.span("sqlite", book=book):
+                export.add_book(book, index)
+        with METRICS.span("extract", book=book):
+            texts.add((ref, book_hash, extract_verses(index, chapter, start_v, end_v))
+                      for ref, (_, chapter, start_v, end_v) in pending)
+        for key, (_, chapter, start_v, end_v) in theme_refs_by_book.get(book, []):
+            spans = theme_spans(index, chapter, start_v, end_v)
+            if not spans:
+                print(f"  SKIP theme {key[0]} (verses not found): {THEMES[key[0]][key[1]]}", file=sys.stderr)
+                METRICS.count("themes.skipped.verses_not_found")
+                continue
+            resolved_themes[key] = (book_slug(book), spans)
+            if export is not None:
+                export.add_theme(key[0], book, spans)
+        if args.full:
+            slug = book_slug(book)
+            written += writer.write_json(os.path.join(args.bible_dir, f"{slug}.json"), bible_book_json(book, index))
+
+    print(f"\nLoaded {len(loaded)} books. Extracting verses ({reused} reused from last build)...\n")
+
+    # Quotes go to a spool on disk as they are assembled; every later stage reads them back from it
+    quotes = stack.enter_context(QuoteSpool())
+    failed = []
+    spans = []
+    for _, parsed, quote in assemble_quotes(all_refs, texts, loaded, failed, skip_identical=args.overlaps != "keep"):
+        quotes.add(quote)
+        if args.balance:
+            spans.append(parsed)
+    problem = incomplete_build(books_needed - loaded, failed, len(quotes))
+    if problem:
+        print(f"\nERROR: not writing {args.output}: {problem}", file=sys.stderr)
+        return 1
+    if args.balance:
+        quotes = stack.enter_context(QuoteSpool(
+            balance_quotes(list(quotes), spans, profile, args.balance, cache, args.source_url)))
 
     # Categorize by length
-    short = [q for q in quotes if q["length"] <= 100]
-    medium = [q for q in quotes if 101 <= q["length"] <= 300]
-    long_ = [q for q in quotes if q["length"] > 300]
+    sizes = Counter("short" if q["length"] <= 100 else "medium" if q["length"] <= 300
+                    else "long" if q["length"] <= 600 else "thicc" for q in quotes)
 
     print(f"Extracted {len(quotes)} quotes:")
-    print(f"  Short  (<=100 chars): {len(short)}")
-    print(f"  Medium (101-300 chars): {len(medium)}")
-    print(f"  Long   (301-600 chars): {len([q for q in long_ if q['length'] <= 600])}")
-    print(f"  Thicc  (601+ chars): {len([q for q in long_ if q['length'] > 600])}")
-
-    # Assign sequential IDs
-    for i, q in enumerate(quotes, start=1):
-        q["id"] = i
-
-    # Build output in Monkeytype format
-    output = {
-        "language": "english",
-        "groups": [
-            [0, 100],
-            [101, 300],
-            [301, 600],
-            [601, 9999]
-        ],
-        "quotes": quotes
-    }
+    print(f"  Short  (<=100 chars): {sizes['short']}")
+    print(f"  Medium (101-300 chars): {sizes['medium']}")
+    print(f"  Long   (301-600 chars): {sizes['long']}")
+    print(f"  Thicc  (601+ chars): {sizes['thicc']}")
+
+    ledger = load_id_ledger(args.output)
+    written_quotes, ids = write_quotes(writer, args.output, args.language, quotes, ledger)
+    save_id_ledger(args.output, {**ledger, **ids})
+    if written_quotes:
+        print(f"\nWrote {len(quotes)} quotes to {args.output}")
+    else:
+        print(f"\n{args.output} is up to date ({len(quotes)} quotes)")
+
+    if args.full:
+        written += writer.write_json(os.path.join(args.bible_dir, "books.json"), books_json(loaded))
+        written += writer.write_json(os.path.join(args.bible_dir, "themes.json"), themes_json(resolved_themes),
+                                     expand_depth=99)
+        print(f"Updated {written} files in {args.bible_dir} ({len(loaded)} books)")
+
+    if corpus is not None:
+        for code, url in args.translation:
+            print(f"\nLoading translation {code} from {url}")
+            print(f"  {load_translation(corpus, code, cache, url, args.offline, args.workers)} books")
+        with METRICS.span("corpus"):
+            updated = writer.write_json(args.corpus, corpus_json(corpus, all_refs))
+        stats = corpus.stats()
+        print(f"{'Wrote' if updated else 'Unchanged'} {args.corpus}: {stats['translations']} translations, "
+              f"{stats['verses']} verses, {stats['distinct_texts']} distinct texts for "
+              f"{stats['verse_texts']} verse texts ({format_size(stats['text_bytes'])} of text)")
+
+    def with_ids():
+        return ({**q, "id": ids.get(q["source"])} for q in quotes)
+
+    with METRICS.span("validate"):
+        problems = validate_quote_data({"language": args.language, "groups": QUOTE_GROUPS, "quotes": with_ids()},
+                                       args.language)
+    if args.features:
+        # Pair rarity is relative to the whole file, so this stage needs every quote at once
+        with METRICS.span("features"):
+            features = quote_features_json(args.language, list(with_ids()))
+        updated = writer.write_json(args.features, features)
+        print(f"{'Wrote' if updated else 'Unchanged'} features for {len(quotes)} quotes to {args.features}")
+
+    if export is not None:
+        export.add_quotes(quotes, ids)
+        with METRICS.span("sqlite"):
+            updated = export.finish()
+        print(f"{'Wrote' if updated else 'Unchanged'} {args.sqlite} ({format_size(os.path.getsize(args.sqlite))})")
+
+    texts.commit()
+    save_manifest(manifest_path, manifest)
+
+    if args.publish:
+        with METRICS.span("publish"):
+            copied, removed = publish([row[0] for row in writer.sizes], args.static_dir, writer.compress)
+        print(f"Published {len(writer.sizes)} files ({copied} new hashed copies, {removed} stale removed)")
+
+    violations = writer.report(args.max_file_size, args.max_total_size)
+    METRICS.count("quotes", len(quotes))
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(METRICS.report(), f, indent=2)
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as f:
+            json.dump(METRICS.chrome_trace(), f)
+    for qid, level, problem in problems:
+        print(f"  INVALID ({level}) {args.output}:{qid}: {problem}", file=sys.stderr)
+    if violations:
+        for violation in violations:
+            print(f"  SIZE BUDGET EXCEEDED: {violation}", file=sys.stderr)
+        return 1
+    if any(level == ERROR for _, level, _ in problems):
+        return 1
+    return 0
+
+
+
+def build_index(args) -> int:
+    """Index and shard the whole-book files of a bible/ directory, as the frontend build does.
 
-    out_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-        "frontend", "static", "quotes", "english.json"
-    )
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    Only the files already in the directory are read (books.json names the
+    books, themes.json gives the per-theme counts), so this needs neither the
+    network nor the book cache.
+    """
+    bible_dir = args.index_dir
+    writer = OutputWriter(args.format, args.compress)
+    with open(os.path.join(bible_dir, "books.json"), encoding="utf-8") as f:
+        names = [entry["name"] for entry in json.load(f)]
+    with open(os.path.join(bible_dir, "themes.json"), encoding="utf-8") as f:
+        themes = json.load(f)
+    books = {book_display_name(book): book for book in BOOK_FILES}
 
-    print(f"\nWrote {len(quotes)} quotes to {out_path}")
+    shard_entries = []
+    written = 0
+    for name in names:
+        book = books[name]
+        slug = book_slug(book)
+        with open(os.path.join(bible_dir, f"{slug}.json"), encoding="utf-8") as f:
+            index = BookIndex.from_bible_json(json.load(f))
+        with METRICS.span("passages", book=book):
+            passages = passage_index_json(index)
+        written += writer.write_json(os.path.join(bible_dir, "passages", f"{slug}.json"), passages)
+        theme_runs = {theme: books_runs[slug] for theme, books_runs in themes.items() if slug in books_runs}
+        with METRICS.span("shards", book=book):
+            for first, last in chapter_shards(index, args.shard_size):
+                shard = shard_json(book, index, passages, first, last)
+                written += writer.write_json(os.path.join(bible_dir, "shards", f"{slug}-{first}-{last}.json"), shard)
+                shard_entries.append(shard_entry(slug, shard, first, last, writer.last_size, theme_runs))
+    written += writer.write_json(os.path.join(bible_dir, "shards.json"),
+                                 {"groups": QUOTE_GROUPS, "shards": shard_entries}, expand_depth=3)
+    written += prune_shards(os.path.join(bible_dir, "shards"), {e["file"] for e in shard_entries})
+    print(f"Updated {written} files in {bible_dir} ({len(names)} passage indexes, {len(shard_entries)} shards)")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
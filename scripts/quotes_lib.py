@@ -0,0 +1,1133 @@
+"""
+Shared code for the quote and data files in frontend/static: prettier-style
+JSON output, quote-file assembly, typing-difficulty features, validation
+against packages/schemas and content-hashed publishing.
+
+generate-bible-quotes.py, build-quotes.py and validate-quotes.py all import
+it, so every file they touch is built and checked by the same rules.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+
+try:
+    import brotli
+except ImportError:  # optional, only needed for .br siblings and sizes
+    brotli = None
+
+try:
+    import numpy
+except ImportError:  # optional, only speeds up quote_features()
+    numpy = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(REPO_ROOT, "frontend", "static")
+# Written next to version.json by --publish; nothing deploys or reads it yet
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+# Hex digits of the content hash in published names
+HASH_LENGTH = 8
+PRINT_WIDTH = 80
+# Character-length groups shared by english.json and the passage index
+QUOTE_GROUPS = [
+    [0, 100],
+    [101, 300],
+    [301, 600],
+    [601, 9999],
+]
+
+
+# ============================================================
+# Metrics
+# Stage timings and counters for --metrics and --trace
+# ============================================================
+
+class Metrics:
+    """Stage spans, counters and byte totals collected over one run."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []  # (name, category, start, duration, thread id, args)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.spans.append((name, category, start - self.origin, duration, threading.get_ident(), args))
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def report(self) -> dict:
+        stages = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        for name, _, _, duration, _, _ in self.spans:
+            stages[name]["count"] += 1
+            stages[name]["seconds"] += duration
+        return {
+            "wall_seconds": round(time.perf_counter() - self.origin, 6),
+            "stages": {name: {"count": s["count"], "seconds": round(s["seconds"], 6)}
+                       for name, s in sorted(stages.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def chrome_trace(self) -> dict:
+        threads = {}
+        events = []
+        for name, category, start, duration, thread, args in self.spans:
+            tid = threads.setdefault(thread, len(threads) + 1)
+            events.append({
+                "name": name, "cat": category, "ph": "X", "pid": 1, "tid": tid,
+                "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "args": args,
+            })
+        events.sort(key=lambda e: e["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+METRICS = Metrics()
+
+
+# ============================================================
+# Streaming JSON input
+# Decodes one array item at a time, so memory is bounded by
+# the largest item rather than by the whole document.
+# ============================================================
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonReader:
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or "" at the end of input."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str) -> str:
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"expected one of {expected!r}, found {char or 'end of input'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the buffer; retry with more
+                if self._fill():
+                    continue
+                raise
+            # A number at the very end may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(",]") == "]":
+                return
+
+
+def stream_json_members(stream, streamed=()):
+    """Yield (key, value) for each member of the top-level object in a text stream.
+
+    Members named in `streamed` must be arrays: their value is an iterator
+    that decodes the items one at a time, and it has to be used before the
+    next member is read (whatever is left of it is skipped). Every other value
+    is decoded whole.
+    """
+    reader = _JsonReader(stream)
+    reader.take("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.take(":")
+        if key in streamed:
+            items = reader.items()
+            yield key, items
+            for _ in items:
+                pass
+        else:
+            yield key, reader.value()
+        if reader.take(",}") == "}":
+            return
+
+
+# ============================================================
+# Output formatting
+# Mirrors prettier's JSON layout so generated files match the
+# formatted copies in the repo byte for byte.
+# ============================================================
+
+def _json_flat_pieces(value):
+    if isinstance(value, dict):
+        if not value:
+            yield "{}"
+            return
+        yield "{ "
+        for i, (k, v) in enumerate(value.items()):
+            yield f"{', ' if i else ''}{json.dumps(k, ensure_ascii=False)}: "
+            yield from _json_flat_pieces(v)
+        yield " }"
+    elif isinstance(value, list):
+        yield "["
+        for i, v in enumerate(value):
+            if i:
+                yield ", "
+            yield from _json_flat_pieces(v)
+        yield "]"
+    else:
+        yield json.dumps(value, ensure_ascii=False)
+
+
+def _json_flat(value, width: int | None = None) -> str | None:
+    """Single-line form of value, or None as soon as it is known to be wider than `width`."""
+    parts = []
+    total = 0
+    for piece in _json_flat_pieces(value):
+        total += len(piece)
+        if width is not None and total > width:
+            return None
+        parts.append(piece)
+    return "".join(parts)
+
+
+def _json_always_breaks(value: list) -> bool:
+    # prettier always breaks arrays of two or more multi-entry objects/arrays
+    if len(value) < 2:
+        return False
+    first = type(value[0])
+    return all(type(v) is first and isinstance(v, (dict, list)) and len(v) > 1 for v in value)
+
+
+_END = object()
+
+
+def _json_chunks(value, indent: int, column: int, suffix: int, depth: int, expand_depth: int):
+    """Yield the formatted value piece by piece; lists may be given as iterators."""
+    if isinstance(value, (dict, list)) and not value:
+        yield "{}" if isinstance(value, dict) else "[]"
+        return
+    if not isinstance(value, (dict, list, Iterator)):
+        yield json.dumps(value, ensure_ascii=False)
+        return
+    pad = " " * (indent + 2)
+    width = PRINT_WIDTH - column - suffix
+
+    if isinstance(value, dict):
+        if depth >= expand_depth:
+            flat = _json_flat(value, width)
+            if flat is not None:
+                yield flat
+                return
+        yield "{\n"
+        for i, (k, v) in enumerate(value.items()):
+            key = f"{json.dumps(k, ensure_ascii=False)}: "
+            comma = "," if i < len(value) - 1 else ""
+            yield pad + key
+            yield from _json_chunks(v, indent + 2, len(pad) + len(key), len(comma), depth + 1, expand_depth)
+            yield comma + "\n"
+        yield " " * indent + "}"
+        return
+
+    if isinstance(value, list):
+        if not _json_always_breaks(value):
+            flat = _json_flat(value, width)
+            if flat is not None:
+                yield flat
+                return
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+            # Number arrays are filled: as many items per line as fit
+            yield "[\n"
+            line = ""
+            for item in map(_json_flat, value):
+                if line and len(line) + 2 + len(item) <= PRINT_WIDTH:
+                    line += ", " + item
+                    continue
+                if line:
+                    yield line + ",\n"
+                line = pad + item
+            yield line + "\n" + " " * indent + "]"
+            return
+    else:
+        # A streamed array can't be measured without materializing it, so it
+        # is always broken; for anything long enough to stream that is what
+        # prettier does too
+        first = next(value, _END)
+        if first is _END:
+            yield "[]"
+            return
+        value = _chain_first(first, value)
+
+    yield "[\n"
+    items = iter(value)
+    item = next(items)
+    while item is not _END:
+        following = next(items, _END)
+        comma = "," if following is not _END else ""
+        yield pad
+        yield from _json_chunks(item, indent + 2, len(pad), len(comma), depth + 1, expand_depth)
+        yield comma + "\n"
+        item = following
+    yield " " * indent + "]"
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+def iter_json(value, expand_depth: int = 1):
+    """format_json() as a stream of string chunks. Lists anywhere in `value` may be
+    iterators; they are consumed lazily, so a whole document never has to exist
+    in memory at once."""
+    yield from _json_chunks(value, 0, 0, 0, 0, expand_depth)
+    yield "\n"
+
+
+def format_json(value, expand_depth: int = 1) -> str:
+    """Serialize like prettier. Objects less than `expand_depth` levels deep are
+    always broken over several lines; deeper ones stay inline when they fit."""
+    return "".join(iter_json(value, expand_depth))
+
+
+def file_sha256(path: str) -> str | None:
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+class AtomicFile:
+    """Binary output written through a temp file next to `path`.
+
+    On a clean exit the temp file replaces `path` only if the content differs,
+    and `changed` says whether it did. With `dry_run` nothing touches the disk;
+    the content is only hashed, so `changed` reports what a write would do.
+    """
+
+    def __init__(self, path: str, dry_run: bool = False):
+        self.path = path
+        self.dry_run = dry_run
+        self.changed = False
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._file = None
+
+    def __enter__(self):
+        if not self.dry_run:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self._tmp, "wb")
+        return self
+
+    def write(self, data: bytes):
+        self._hash.update(data)
+        self.size += len(data)
+        if self._file is not None:
+            self._file.write(data)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+        self.changed = exc_type is None and file_sha256(self.path) != self._hash.hexdigest()
+        if self._file is not None:
+            if self.changed:
+                os.replace(self._tmp, self.path)
+            else:
+                os.remove(self._tmp)
+        return False
+
+
+def write_chunks(path: str, chunks, dry_run: bool = False) -> bool:
+    """Stream string chunks to a file unless it already has exactly this content.
+    Returns whether it was (or, with dry_run, would be) written."""
+    with AtomicFile(path, dry_run) as out:
+        for chunk in chunks:
+            out.write(chunk.encode("utf-8"))
+    return out.changed
+
+
+def write_text(path: str, text: str) -> bool:
+    """Write a file unless it already has exactly this content. Returns whether it was written."""
+    return write_chunks(path, [text])
+
+
+def materialize(value):
+    """Turn any iterators in value (streamed arrays) into lists."""
+    if isinstance(value, dict):
+        return {k: materialize(v) for k, v in value.items()}
+    if isinstance(value, (list, Iterator)):
+        return [materialize(v) for v in value]
+    return value
+
+
+def to_columnar(value):
+    """Turn every list of same-shaped objects into an object of parallel arrays."""
+    if isinstance(value, dict):
+        return {k: to_columnar(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if value and all(isinstance(v, dict) for v in value):
+            keys = list(value[0])
+            if all(list(v) == keys for v in value):
+                return {k: [to_columnar(v[k]) for v in value] for k in keys}
+        return [to_columnar(v) for v in value]
+    return value
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.2f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size} B"
+
+
+def _emit(block: bytes, sink: AtomicFile | None) -> int:
+    if sink is not None:
+        sink.write(block)
+    return len(block)
+
+
+class OutputWriter:
+    """Serializes generated files in the chosen format and records their sizes."""
+
+    FORMATS = ("pretty", "min", "columnar")
+
+    def __init__(self, fmt: str = "pretty", compress: bool = False):
+        self.fmt = fmt
+        self.compress = compress
+        self.sizes = []  # (path, raw, gzip, brotli or None)
+
+    @property
+    def last_size(self) -> int:
+        """Raw size of the file written last."""
+        return self.sizes[-1][1]
+
+    def serialize(self, value, expand_depth: int):
+        """The file's text as a stream of chunks."""
+        if self.fmt == "pretty":
+            return iter_json(value, expand_depth)
+        value = materialize(value)
+        if self.fmt == "columnar":
+            value = to_columnar(value)
+        return json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).iterencode(value)
+
+    def write_json(self, path: str, value, expand_depth: int = 1) -> bool:
+        """Serialize, write and compress in one pass, a chunk at a time."""
+        name = os.path.relpath(path, REPO_ROOT)
+        # wbits=31 is a gzip container; zlib leaves its mtime at 0, so it is reproducible
+        gz = zlib.compressobj(9, zlib.DEFLATED, 31)
+        br = brotli.Compressor() if brotli is not None else None
+        gz_size = br_size = 0
+        with ExitStack() as stack:
+            out = stack.enter_context(AtomicFile(path))
+            gz_out = stack.enter_context(AtomicFile(f"{path}.gz")) if self.compress else None
+            br_out = stack.enter_context(AtomicFile(f"{path}.br")) if self.compress and br else None
+            with METRICS.span("serialize", file=name):
+                for chunk in self.serialize(value, expand_depth):
+                    data = chunk.encode("utf-8")
+                    out.write(data)
+                    gz_size += _emit(gz.compress(data), gz_out)
+                    if br is not None:
+                        br_size += _emit(br.process(data), br_out)
+                gz_size += _emit(gz.flush(), gz_out)
+                if br is not None:
+                    br_size += _emit(br.finish(), br_out)
+        written = out.changed or any(f is not None and f.changed for f in (gz_out, br_out))
+        METRICS.count("files.written" if out.changed else "files.unchanged")
+        if out.changed:
+            METRICS.count("bytes.written", out.size)
+        self.sizes.append((path, out.size, gz_size, None if br is None else br_size))
+        return written
+
+    def report(self, max_file_size: int | None = None, max_total_size: int | None = None) -> list[str]:
+        """Print the size table. Returns budget violations (sizes are compared gzipped)."""
+        violations = []
+        print(f"\n{'file':<48} {'raw':>10} {'gzip':>10} {'brotli':>10}")
+        for path, raw, gz, br in sorted(self.sizes):
+            name = os.path.relpath(path, REPO_ROOT)
+            flag = ""
+            if max_file_size is not None and gz > max_file_size:
+                flag = "  OVER BUDGET"
+                violations.append(f"{name}: {format_size(gz)} gzipped > {format_size(max_file_size)}")
+            br_text = "-" if br is None else format_size(br)
+            print(f"{name:<48} {format_size(raw):>10} {format_size(gz):>10} {br_text:>10}{flag}")
+
+        total_raw = sum(row[1] for row in self.sizes)
+        total_gz = sum(row[2] for row in self.sizes)
+        print(f"{'total (' + str(len(self.sizes)) + ' files)':<48} {format_size(total_raw):>10} {format_size(total_gz):>10}")
+        if max_total_size is not None and total_gz > max_total_size:
+            violations.append(f"total: {format_size(total_gz)} gzipped > {format_size(max_total_size)}")
+        return violations
+
+
+# ============================================================
+# Publishing
+# Content-hashed copies of generated files, so a CDN can serve
+# them as immutable and clients only refetch what changed.
+# ============================================================
+
+_HASHED_NAME = re.compile(rf"^.+\.[0-9a-f]{{{HASH_LENGTH}}}\.json(\.gz|\.br)?$")
+
+
+def hashed_path(path: str, digest: str) -> str:
+    """'quotes/english.json' -> 'quotes/english.<hash>.json'."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def is_hashed_name(name: str) -> bool:
+    """Whether a file name is a published copy made by hashed_path()."""
+    return _HASHED_NAME.match(name) is not None
+
+
+def publish(paths, static_dir: str = STATIC_DIR, compressed: bool = False) -> tuple[int, int]:
+    """Copy files to content-hashed names and map them in asset-manifest.json.
+
+    Keys and values are paths relative to `static_dir`, the form the frontend
+    fetches them by. Entries from earlier runs stay until their file is gone,
+    so publishing a partial build keeps the rest of the manifest. Hashed
+    copies no entry points to any more are deleted. With `compressed` the
+    .gz/.br siblings are copied too. Returns (files copied, files removed).
+    """
+    manifest_path = os.path.join(static_dir, ASSET_MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    # Directories that had hashed copies, even if none of their files is published any more
+    directories = {os.path.dirname(value) for value in manifest.values()}
+
+    copied = 0
+    for path in paths:
+        key = os.path.relpath(path, static_dir)
+        if key.startswith(os.pardir):
+            print(f"  NOT PUBLISHED (outside {static_dir}): {path}", file=sys.stderr)
+            continue
+        target = hashed_path(path, file_sha256(path))
+        for suffix in ("", ".gz", ".br") if compressed else ("",):
+            # Same name means same content, so an existing copy is never rewritten
+            if os.path.exists(path + suffix) and not os.path.exists(target + suffix):
+                shutil.copyfile(path + suffix, target + suffix)
+                copied += 1
+        manifest[key.replace(os.sep, "/")] = os.path.relpath(target, static_dir).replace(os.sep, "/")
+
+    manifest = {key: value for key, value in sorted(manifest.items())
+                if os.path.exists(os.path.join(static_dir, key))}
+    write_text(manifest_path, format_json(manifest))
+
+    live = set(manifest.values())
+    directories |= {os.path.dirname(value) for value in live}
+    removed = 0
+    for directory in sorted(directories):
+        if not os.path.isdir(os.path.join(static_dir, directory)):
+            continue
+        for name in os.listdir(os.path.join(static_dir, directory)):
+            relative = f"{directory}/{name}" if directory else name
+            if _HASHED_NAME.match(name) and relative.removesuffix(".gz").removesuffix(".br") not in live:
+                os.remove(os.path.join(static_dir, relative))
+                removed += 1
+    return copied, removed
+
+
+# ============================================================
+# Quote files
+# Source-agnostic assembly of the frontend/static/quotes layout
+# ============================================================
+
+def js_length(text: str) -> int:
+    """Length as the frontend's String.length sees it (UTF-16 code units)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def normalize_quote_text(text: str, code: bool = False) -> str:
+    """NFC-normalize a quote. Prose also gets runs of spaces collapsed and its ends
+    trimmed; code keeps its whitespace since indentation is part of the quote."""
+    text = unicodedata.normalize("NFC", text)
+    if code:
+        return text
+    return re.sub(r"[ \t]+", " ", text).strip()
+
+
+def _clean_quotes(quotes, code: bool, normalize: bool, dedupe: bool, stats: Counter):
+    """Normalize, drop duplicates and recompute lengths, one quote at a time."""
+    # Digests rather than texts, so dedupe state stays small on big corpora
+    seen = set()
+    for quote in quotes:
+        quote = dict(quote)
+        if normalize:
+            text = normalize_quote_text(quote["text"], code)
+            if text != quote["text"]:
+                quote["text"] = text
+                stats["normalized"] += 1
+        if dedupe:
+            digest = hashlib.blake2b(quote["text"].encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+        length = js_length(quote["text"])
+        if quote.get("length") != length:
+            quote["length"] = length
+            stats["lengths"] += 1
+        yield quote
+
+
+def _sort_by_group(quotes, groups, stats: Counter):
+    """Stable bucket sort by length group, spooling each bucket to a temp file."""
+    spools = [tempfile.TemporaryFile("w+", encoding="utf-8") for _ in range(len(groups) + 1)]
+    try:
+        highest = 0
+        for quote in quotes:
+            group = length_group(quote["length"], groups)
+            bucket = len(groups) if group is None else group
+            if bucket < highest:
+                stats["regrouped"] += 1
+            highest = max(highest, bucket)
+            spools[bucket].write(json.dumps(quote, ensure_ascii=False) + "\n")
+        for spool in spools:
+            spool.seek(0)
+            for line in spool:
+                yield json.loads(line)
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def _assign_ids(quotes, known_ids: dict, next_id: int, reid: bool, stats: Counter):
+    for new_id, quote in enumerate(quotes, start=1):
+        if reid:
+            if quote.get("id") != new_id:
+                stats["reidentified"] += 1
+            quote["id"] = new_id
+        elif "id" not in quote:
+            quote["id"] = known_ids.get(quote.get("source"))
+            if quote["id"] is None:
+                quote["id"] = next_id
+                next_id += 1
+                stats["new_ids"] += 1
+        yield quote
+
+
+def iter_quote_file(language: str, groups, quotes, stats: Counter, known_ids: dict | None = None,
+                    max_id: int = 0, normalize: bool = False, dedupe: bool = False,
+                    sort_by_group: bool = False, reid: bool = False):
+    """The assembly passes of build_quote_file() as a lazy pipeline over `quotes`.
+
+    Quotes are pulled through one at a time (sorting spools to disk), so the
+    result can go straight to iter_json(). Fresh ids start above `max_id` and
+    `known_ids`; the caller has to know the highest id already in `quotes`.
+    Counts land in `stats` as the pipeline is consumed.
+    """
+    known_ids = known_ids or {}
+    result = _clean_quotes(quotes, language.startswith("code_"), normalize, dedupe, stats)
+    if sort_by_group:
+        result = _sort_by_group(result, groups, stats)
+    next_id = max([max_id, *known_ids.values()]) + 1
+    return _assign_ids(result, known_ids, next_id, reid, stats)
+
+
+def build_quote_file(language: str, groups, quotes, known_ids: dict | None = None,
+                     normalize: bool = False, dedupe: bool = False,
+                     sort_by_group: bool = False, reid: bool = False) -> tuple[dict, Counter]:
+    """Assemble quotes into the {language, groups, quotes} layout.
+
+    Lengths are always recomputed. Quotes keep their own id, then one from
+    `known_ids` (by source), and otherwise get a fresh id above the highest in
+    use or known; `reid` instead numbers them 1..n in output order. Returns
+    the file contents and counts of what changed.
+    """
+    stats = Counter()
+    max_id = max((q["id"] for q in quotes if "id" in q), default=0)
+    result = list(iter_quote_file(language, groups, quotes, stats, known_ids, max_id,
+                                  normalize, dedupe, sort_by_group, reid))
+    return {"language": language, "groups": groups, "quotes": result}, stats
+
+
+def rebuild_quote_file(path: str, check: bool = False, **options) -> tuple[bool, Counter, int]:
+    """Run a quote file through the build_quote_file() passes and write it back in place.
+
+    The file is streamed in and out, so memory stays flat however many quotes
+    it holds. With `check` nothing is written. Returns whether the file
+    changed (or would), the stats and the number of quotes written.
+    """
+    max_id = 0
+    if not options.get("reid"):
+        with open(path, encoding="utf-8") as f:
+            for key, value in stream_json_members(f, ("quotes",)):
+                if key == "quotes":
+                    max_id = max((q["id"] for q in value if "id" in q), default=0)
+
+    stats = Counter()
+    total = 0
+
+    def counted(quotes):
+        nonlocal total
+        for quote in quotes:
+            total += 1
+            yield quote
+
+    # The input is closed before AtomicFile swaps the new file in
+    with AtomicFile(path, dry_run=check) as out:
+        with open(path, encoding="utf-8") as f:
+            header = {}
+            for key, value in stream_json_members(f, ("quotes",)):
+                if key != "quotes":
+                    header[key] = value
+                    continue
+                quotes = iter_quote_file(header["language"], header["groups"], value, stats,
+                                         max_id=max_id, **options)
+                layout = {"language": header["language"], "groups": header["groups"], "quotes": counted(quotes)}
+                for chunk in iter_json(layout, expand_depth=3):
+                    out.write(chunk.encode("utf-8"))
+            if out.size == 0:
+                raise KeyError("quotes")
+    return out.changed, stats, total
+
+
+def length_group(length: int, groups=QUOTE_GROUPS) -> int | None:
+    for i, (low, high) in enumerate(groups):
+        if low <= length <= high:
+            return i
+    return None
+
+
+def load_quote_ids(path: str) -> dict:
+    """Map each source in an existing quotes file to its id, so ids survive rebuilds."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            for key, value in stream_json_members(f, ("quotes",)):
+                if key == "quotes":
+                    return {q["source"]: q["id"] for q in value if "source" in q and "id" in q}
+    except OSError:
+        return {}
+    except ValueError:
+        # Written with --format columnar (quotes is an object), or not JSON at all
+        try:
+            with open(path, encoding="utf-8") as f:
+                quotes = json.load(f)["quotes"]
+            return dict(zip(quotes.get("source", []), quotes.get("id", [])))
+        except (OSError, ValueError, LookupError, AttributeError):
+            return {}
+    return {}
+
+
+def write_quotes(writer: OutputWriter, path: str, language: str, quotes,
+                 known_ids: dict | None = None) -> tuple[bool, dict]:
+    """Write a quotes file. Quotes keep the id their source has in `known_ids`
+    or in the file already; new quotes get fresh ones above every id in
+    either, so an id `known_ids` still remembers is never handed out again.
+
+    `quotes` (without ids) is consumed once, a quote at a time, straight into
+    the writer. Returns whether the file changed and the source -> id map of
+    its quotes."""
+    known_ids = {**(known_ids or {}), **load_quote_ids(path)}
+    ids = {}
+
+    def recorded(quotes):
+        for quote in quotes:
+            ids[quote["source"]] = quote["id"]
+            yield quote
+
+    quotes = iter_quote_file(language, QUOTE_GROUPS, quotes, Counter(), known_ids)
+    layout = {"language": language, "groups": QUOTE_GROUPS, "quotes": recorded(quotes)}
+    return writer.write_json(path, layout, expand_depth=3), ids
+
+
+# ============================================================
+# Quote features
+# Typing-difficulty stats per quote, computed once at build
+# time over a whole file so clients can select by lookup.
+# ============================================================
+
+# Features are stored as integers; divide by the scale for the actual value
+FEATURE_SCALES = {
+    "punctuation": 1000,  # punctuation and symbols per character
+    "capitals": 1000,  # capitals per letter
+    "wordLength": 100,  # non-space characters per word
+    "rareBigrams": 100,  # mean surprisal in bits of the quote's character pairs
+    "nonAscii": 1,  # characters outside ASCII
+}
+
+
+def _char_flags(char: str) -> tuple[bool, bool, bool, bool, bool]:
+    """(space, letter, capital, punctuation or symbol, non-ASCII) for one character."""
+    category = unicodedata.category(char)
+    return char.isspace(), char.isalpha(), char.isupper(), category[0] in "PS", ord(char) > 127
+
+
+def _fold(char: str) -> str:
+    # Case doesn't change which keys a pair needs beyond shift; multi-character
+    # lowercase forms (e.g. "İ") are kept as they are
+    lower = char.lower()
+    return lower if len(lower) == 1 else char
+
+
+def _feature_counts(texts: list[str]):
+    """Per-text counts (chars, spaces, letters, capitals, punctuation, non-ASCII,
+    words, pairs) plus each text's summed pair surprisal, as lists."""
+    if numpy is not None:
+        return _feature_counts_numpy(texts)
+
+    folded_texts = [[_fold(c) for c in text] for text in texts]
+    pair_counts = Counter()
+    for folded in folded_texts:
+        pair_counts.update(zip(folded, folded[1:]))
+    total = sum(pair_counts.values())
+    surprisal = {pair: -math.log2(count / total) for pair, count in pair_counts.items()}
+
+    flags = {}
+    counts = [[] for _ in range(8)]
+    sums = []
+    for text, folded in zip(texts, folded_texts):
+        row = [len(text), 0, 0, 0, 0, 0, 0, max(len(text) - 1, 0)]
+        previous_space = True
+        for char in text:
+            f = flags.get(char)
+            if f is None:
+                f = flags[char] = _char_flags(char)
+            for i in range(5):
+                row[i + 1] += f[i]
+            row[6] += previous_space and not f[0]
+            previous_space = f[0]
+        total = 0.0
+        for pair in zip(folded, folded[1:]):
+            total += surprisal[pair]
+        for column, value in zip(counts, row):
+            column.append(value)
+        sums.append(total)
+    return counts, sums
+
+
+def _feature_counts_numpy(texts: list[str]):
+    """_feature_counts() as array operations over every character at once."""
+    n = len(texts)
+    lengths = numpy.array([len(t) for t in texts], dtype=numpy.int64)
+    joined = "".join(texts)
+    codes = numpy.frombuffer(joined.encode("utf-32-le"), dtype=numpy.uint32)
+    quote_of = numpy.repeat(numpy.arange(n), lengths)
+    first = numpy.zeros(len(codes), dtype=bool)
+    first[numpy.cumsum(lengths)[lengths > 0] - lengths[lengths > 0]] = True
+
+    # Characters become indexes into the alphabet through a code point lookup
+    # table, which is much cheaper than numpy.unique's argsort
+    alphabet = sorted(set(joined))
+    lookup = numpy.zeros(ord(alphabet[-1]) + 1 if alphabet else 1, dtype=numpy.uint32)
+    lookup[[ord(c) for c in alphabet]] = numpy.arange(len(alphabet), dtype=numpy.uint32)
+    inverse = lookup[codes]
+    flags = numpy.array([_char_flags(c) for c in alphabet], dtype=bool).reshape(-1, 5)[inverse]
+    space = flags[:, 0]
+    word_start = ~space & (first | numpy.concatenate(([True], space[:-1])))
+
+    def per_quote(mask):
+        return numpy.bincount(quote_of[mask], minlength=n)
+
+    counts = [lengths] + [per_quote(flags[:, i]) for i in range(5)] + [per_quote(word_start),
+                                                                       numpy.maximum(lengths - 1, 0)]
+
+    # Pairs never cross from one text into the next
+    folded_ids = {}
+    fold = numpy.array([folded_ids.setdefault(_fold(c), len(folded_ids)) for c in alphabet], dtype=numpy.int64)
+    folded = fold[inverse]
+    inside = ~first[1:]
+    keys = folded[:-1][inside] * len(folded_ids) + folded[1:][inside]
+    pairs, pair_counts = numpy.unique(keys, return_counts=True)
+    # Same arithmetic as the pure Python path, so both give identical output
+    total = len(keys)
+    surprisal = numpy.array([-math.log2(c / total) for c in pair_counts.tolist()])
+    values = surprisal[numpy.searchsorted(pairs, keys)]
+    sums = numpy.bincount(quote_of[1:][inside], weights=values, minlength=n)
+    return [c.tolist() for c in counts], sums.tolist()
+
+
+def quote_features(texts: list[str]) -> dict[str, list[int]]:
+    """FEATURE_SCALES features for each text, as one list per feature.
+
+    Pair rarity is relative to the texts given: a pair's surprisal is
+    -log2 of its share of all pairs in the batch, so a whole quote file
+    should be passed at once.
+    """
+    (chars, spaces, letters, capitals, punctuation, non_ascii, words, pairs), sums = _feature_counts(texts)
+    scale = FEATURE_SCALES
+
+    def ratio(part, whole, key):
+        return [round(p * scale[key] / w) if w else 0 for p, w in zip(part, whole)]
+
+    non_space = [c - s for c, s in zip(chars, spaces)]
+    return {
+        "punctuation": ratio(punctuation, chars, "punctuation"),
+        "capitals": ratio(capitals, letters, "capitals"),
+        "wordLength": ratio(non_space, words, "wordLength"),
+        "rareBigrams": [round(s * scale["rareBigrams"] / p) if p else 0 for s, p in zip(sums, pairs)],
+        "nonAscii": list(non_ascii),
+    }
+
+
+def quote_features_json(language: str, quotes: list[dict]) -> dict:
+    """The side table: features as parallel arrays (see to_columnar) keyed by quote id."""
+    return {
+        "language": language,
+        "scale": FEATURE_SCALES,
+        "quotes": {"id": [q["id"] for q in quotes], **quote_features([q["text"] for q in quotes])},
+    }
+
+
+# ============================================================
+# Validation
+# Checks quote and Bible files against the contracts in
+# packages/schemas/src/quotes.ts and homoglyphs.ts.
+# ============================================================
+
+# Mirrors packages/schemas/src/validation/homoglyphs.ts: letter -> lookalikes
+HOMOGLYPHS = {
+    "a": "\u0430\u00e0\u00e1\u1ea1\u0105",
+    "c": "\u0441\u0188\u010b",
+    "d": "\u0501\u0257",
+    "e": "\u0435\u1eb9\u0117\u00e9\u00e8",
+    "g": "\u0121",
+    "h": "\u04bb",
+    "i": "\u0456\u00ed\u00ec\u00ef",
+    "j": "\u0458\u029d",
+    "k": "\u03ba",
+    "l": "\u04cf\u1e37",
+    "n": "\u0578",
+    "o": "\u043e\u03bf\u0585\u022f\u1ecd\u1ecf\u01a1\u00f6\u00f3\u00f2",
+    "p": "\u0440",
+    "q": "\u0566",
+    "s": "\u0282",
+    "u": "\u03c5\u057d\u00fc\u00fa\u00f9",
+    "v": "\u03bd\u0475",
+    "x": "\u0445\u04b3",
+    "y": "\u0443\u00fd",
+    "z": "\u0290\u017c",
+}
+# Accented Latin letters in that list are ordinary text in many languages; the
+# ones from other scripts are what spoofing uses, and only inside a Latin word
+SPOOFING_TABLE = str.maketrans({
+    glyph: letter
+    for letter, glyphs in HOMOGLYPHS.items() for glyph in glyphs
+    if not unicodedata.name(glyph).startswith("LATIN")
+})
+_LATIN_LETTER = re.compile(r"[A-Za-z]")
+_WORD = re.compile(r"\w+")
+# Non-printable characters a quote may contain: newlines and tabs in code
+# quotes, and the joiners Persian and Indic scripts need
+ALLOWED_INVISIBLE = "\n\t\u200c\u200d"
+QUOTE_KEYS = {"id", "text", "source", "length"}
+OPTIONAL_QUOTE_KEYS = {"britishText", "approvedBy"}
+# Errors fail validation; warnings (typography a typist may struggle with but
+# that is often deliberate, like French no-break spaces) only with strict
+ERROR = "error"
+WARNING = "warning"
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _describe(chars) -> str:
+    return ", ".join(f"U+{ord(c):04X} {unicodedata.name(c, '')}".rstrip() for c in sorted(chars))
+
+
+def text_problems(text) -> list[tuple[str, str]]:
+    """(level, problem) for one text: odd characters, non-NFC form and words
+    that mix Latin letters with lookalikes from another script."""
+    if not isinstance(text, str):
+        return [(ERROR, f"text is {type(text).__name__}, not a string")]
+    if not text.strip():
+        return [(ERROR, "text is empty")]
+    problems = []
+    # isprintable() is false for every control, format, private-use,
+    # surrogate, unassigned and non-space separator character
+    if not text.isprintable():
+        odd = {c for c in text if not c.isprintable() and c not in ALLOWED_INVISIBLE}
+        spaces = {c for c in odd if unicodedata.category(c) == "Zs"}
+        if spaces:
+            problems.append((WARNING, f"contains {_describe(spaces)}"))
+        if odd - spaces:
+            problems.append((ERROR, f"contains {_describe(odd - spaces)}"))
+    if not unicodedata.is_normalized("NFC", text):
+        problems.append((WARNING, "is not NFC-normalized"))
+    if text.translate(SPOOFING_TABLE) != text:
+        for word in _WORD.findall(text):
+            if word.translate(SPOOFING_TABLE) != word and _LATIN_LETTER.search(word):
+                glyphs = ", ".join(f"U+{ord(c):04X} looks like '{c.translate(SPOOFING_TABLE)}'"
+                                   for c in dict.fromkeys(word) if c.translate(SPOOFING_TABLE) != c)
+                problems.append((ERROR, f"'{word}' mixes Latin and other scripts ({glyphs})"))
+    return problems
+
+
+def validate_quote_data(data: dict, name: str) -> list[tuple[str, str, str]]:
+    """(quote id, level, problem) for everything in a quotes file that
+    QuoteDataSchema or the text rules reject; an id of "" is the file itself."""
+    problems = []
+    extra = set(data) - {"language", "groups", "quotes"}
+    if extra:
+        problems.append(("", ERROR, f"unexpected keys {sorted(extra)}"))
+    if data.get("language") != name:
+        problems.append(("", ERROR, f"language {data.get('language')!r} does not match the file name"))
+    groups = data.get("groups")
+    if not (isinstance(groups, list) and len(groups) == 4
+            and all(isinstance(g, list) and len(g) == 2 and all(_is_int(n) for n in g) for g in groups)):
+        problems.append(("", ERROR, "groups must be 4 [min, max] pairs"))
+    quotes = data.get("quotes")
+    if not isinstance(quotes, (list, Iterator)):
+        return problems + [("", ERROR, "quotes must be a list")]
+
+    seen = set()
+    for n, quote in enumerate(quotes):
+        if not isinstance(quote, dict):
+            problems.append((f"#{n}", ERROR, "quote is not an object"))
+            continue
+        qid = quote.get("id")
+        label = str(qid) if qid is not None else f"#{n}"
+        missing = QUOTE_KEYS - set(quote)
+        extra = set(quote) - QUOTE_KEYS - OPTIONAL_QUOTE_KEYS
+        if missing:
+            problems.append((label, ERROR, f"missing {sorted(missing)}"))
+        if extra:
+            problems.append((label, ERROR, f"unexpected keys {sorted(extra)}"))
+        if not _is_int(qid) or qid < 0:
+            problems.append((label, ERROR, f"id {qid!r} is not a non-negative integer"))
+        elif qid in seen:
+            problems.append((label, ERROR, "duplicate id"))
+        else:
+            seen.add(qid)
+        for key in ("source", "approvedBy"):
+            if key in quote and not isinstance(quote[key], str):
+                problems.append((label, ERROR, f"{key} is not a string"))
+        text = quote.get("text")
+        problems += [(label, level, problem) for level, problem in text_problems(text)]
+        if "britishText" in quote:
+            problems += [(label, level, f"britishText {problem}")
+                         for level, problem in text_problems(quote["britishText"])]
+        length = quote.get("length")
+        if not _is_int(length) or length <= 0:
+            problems.append((label, ERROR, f"length {length!r} is not a positive integer"))
+        elif isinstance(text, str) and length != js_length(text):
+            problems.append((label, ERROR, f"length {length} but the text is {js_length(text)} long"))
+    return problems
+
+
+def validate_bible_data(data: dict) -> list[tuple[str, str, str]]:
+    """(chapter:verse, level, problem) for a bible_book_json() or shard_json() file."""
+    problems = []
+    extra = set(data) - {"name", "chapters", "passages"}
+    if extra:
+        problems.append(("", ERROR, f"unexpected keys {sorted(extra)}"))
+    if not isinstance(data.get("name"), str):
+        problems.append(("", ERROR, "name is not a string"))
+    chapters = data.get("chapters")
+    if not isinstance(chapters, dict):
+        return problems + [("", ERROR, "chapters must be an object")]
+    for chapter, verses in chapters.items():
+        if not chapter.isdigit() or not isinstance(verses, list):
+            problems.append((chapter, ERROR, "chapter must be a numbered list of verses"))
+            continue
+        previous = 0
+        for n, verse in enumerate(verses, start=1):
+            if not isinstance(verse, dict) or set(verse) != {"v", "t"}:
+                problems.append((f"{chapter}:#{n}", ERROR, "verse must be {v, t}"))
+                continue
+            label = f"{chapter}:{verse['v']}"
+            # Sources may skip verses, but never repeat or reorder them
+            if not isinstance(verse["v"], int) or verse["v"] <= previous:
+                problems.append((label, ERROR, f"verse number out of order (expected more than {previous})"))
+            else:
+                previous = verse["v"]
+            problems += [(label, level, problem) for level, problem in text_problems(verse["t"])]
+    if "passages" in data:
+        problems += validate_passage_rows(data["passages"])
+    return problems
+
+
+def validate_passage_rows(groups) -> list[tuple[str, str, str]]:
+    """Rows of a passage index: [chapter, start, end, length, ...] per length group."""
+    if not isinstance(groups, list) or len(groups) != len(QUOTE_GROUPS):
+        return [("", ERROR, f"passages must be {len(QUOTE_GROUPS)} groups")]
+    problems = []
+    for group, (rows, (low, high)) in enumerate(zip(groups, QUOTE_GROUPS)):
+        if not isinstance(rows, list) or len(rows) % 4 or not all(_is_int(n) and n > 0 for n in rows):
+            problems.append((f"group {group}", ERROR, "rows must be positive [chapter, start, end, length] runs"))
+            continue
+        for i in range(0, len(rows), 4):
+            chapter, start, end, length = rows[i:i + 4]
+            if start > end or not low <= length <= high:
+                problems.append((f"{chapter}:{start}-{end}", ERROR, f"bad passage row in group {group}"))
+    return problems
+
+
+def validate_file(path: str) -> list[tuple[str, str, str]]:
+    """Check one generated file, picking the rules from its layout. Returns
+    (id, level, problem); files of other layouts (manifests, themes) pass."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return [("", ERROR, f"unreadable: {e}")]
+    if not isinstance(data, dict):
+        return []
+    if "quotes" in data:
+        return validate_quote_data(data, os.path.basename(path).split(".")[0])
+    if "chapters" in data:
+        return validate_bible_data(data)
+    if set(data) == {"groups", "passages"}:
+        return validate_passage_rows(data["passages"])
+    return []
@@ -0,0 +1,31 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The scripts import quotes_lib as a sibling module
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+def load_script(name: str):
+    """Import one of the hyphenated scripts in scripts/ as a module."""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(SCRIPTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def gen():
+    return load_script("generate-bible-quotes")
+
+
+def book_data(chapters: dict) -> dict:
+    """A book in the aruljohn/Bible-kjv layout from {chapter: {verse: text}}."""
+    return {"chapters": [
+        {"chapter": str(chapter), "verses": [{"verse": str(n), "text": text} for n, text in verses.items()]}
+        for chapter, verses in chapters.items()
+    ]}
@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import book_data
+
+# Verse lengths cycle so every length group has candidate runs
+CHAPTER = {n: "word " * (5 + n % 9 * 4) + f"v{n}." for n in range(1, 41)}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def gen_variant(gen, request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(gen, "numpy", None)
+    elif gen.numpy is None:
+        pytest.skip("NumPy is not installed")
+    return gen
+
+
+def profile_of(gen, chapters: int = 3):
+    profile = gen.CanonProfile()
+    for book in ("Genesis", "Exodus"):
+        profile.add(book, gen.BookIndex(book_data({c: CHAPTER for c in range(1, chapters + 1)})))
+    return profile
+
+
+def test_targets_are_met_without_shared_verses(gen_variant):
+    gen = gen_variant
+    profile = profile_of(gen)
+    seed = (0, *profile.slot_range("Genesis", 1, 1, 1))
+    targets = [6, 4, 2, 1]
+    kept, picks = gen.select_balanced(profile, [seed], targets)
+
+    assert kept == [0]
+    lengths = [profile.offsets[last] - profile.offsets[first] - 1 for first, last in picks]
+    counts = [sum(gen.length_group(n) == g for n in lengths) for g in range(4)]
+    counts[0] += 1  # the kept seed
+    assert counts == targets
+
+    used = [slot for first, last in [seed[1:], *picks] for slot in range(first, last)]
+    assert len(used) == len(set(used))
+    # Picks never run across a chapter boundary
+    assert all(profile.chapter_of[first] == profile.chapter_of[last - 1] for first, last in picks)
+
+
+def test_seeds_beyond_the_target_are_dropped(gen_variant):
+    gen = gen_variant
+    profile = profile_of(gen)
+    seeds = [(0, *profile.slot_range("Exodus", 2, v, v)) for v in (1, 2, 3)]
+    kept, picks = gen.select_balanced(profile, seeds, [2, 0, 0, 0])
+    assert kept == [0, 1] and picks == []
+
+
+def test_empty_profile_comes_up_short(gen_variant):
+    gen = gen_variant
+    assert gen.length_candidates(gen.CanonProfile()) == [[], [], [], []]
+    assert gen.select_balanced(gen.CanonProfile(), [], [5, 5, 5, 5]) == ([], [])
@@ -0,0 +1,39 @@
+from conftest import book_data
+from quotes_lib import validate_bible_data
+
+# Matthew 17:21 is left out of many modern translations
+VERSES = {n: f"Verse {n}." for n in range(1, 28)}
+GAPPED = {n: text for n, text in VERSES.items() if n != 21}
+
+
+def test_gap_keeps_verse_numbers(gen):
+    index = gen.BookIndex(book_data({17: GAPPED}))
+    assert index.chapter_sizes[16] == 27
+    assert index.passage(17, 22, 22) == "Verse 22."
+    assert index.passage(17, 20, 22) == "Verse 20. Verse 22."
+    assert index.passage(17, 21, 21) == ""
+    assert gen.extract_verses(index, 17, 21, 21) is None
+    assert index.passage(17, 27, 27) == "Verse 27."
+
+
+def test_corpus_resolves_gapped_translation(gen):
+    corpus = gen.Corpus()
+    corpus.add("kjv", "Matthew", gen.BookIndex(book_data({17: VERSES})))
+    corpus.add("alt", "Matthew", gen.BookIndex(book_data({17: GAPPED})))
+
+    span = corpus.resolve("Matthew 17:22")
+    assert span == (gen.verse_id("Matthew", 17, 22),) * 2
+    assert corpus.passage("alt", *span) == "Verse 22."
+    assert corpus.passage("alt", *corpus.resolve("Matthew 17:27")) == "Verse 27."
+    assert corpus.passage("alt", *corpus.resolve("Matthew 17:21")) is None
+    assert corpus.passage("kjv", *corpus.resolve("Matthew 17:21")) == "Verse 21."
+
+    verses = gen.corpus_json(corpus, [])["translations"]["alt"]["verses"]
+    assert verses[20] == 0 and corpus.pool.strings[verses[21]] == "Verse 22."
+
+
+def test_bible_file_keeps_verse_numbers(gen):
+    data = gen.bible_book_json("Matthew", gen.BookIndex(book_data({17: GAPPED})))
+    numbers = [verse["v"] for verse in data["chapters"]["17"]]
+    assert numbers == [n for n in range(1, 28) if n != 21]
+    assert validate_bible_data(data) == []
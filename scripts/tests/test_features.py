@@ -0,0 +1,53 @@
+import pytest
+
+import quotes_lib
+
+TEXTS = ["Hi, Bob!", "aaaa", "", "Café  au lait"]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def lib(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(quotes_lib, "numpy", None)
+    elif quotes_lib.numpy is None:
+        pytest.skip("NumPy is not installed")
+    return quotes_lib
+
+
+def test_feature_values(lib):
+    assert lib.quote_features(TEXTS) == {
+        # 2 of 8 characters, none, none, 0 of 13
+        "punctuation": [250, 0, 0, 0],
+        # 2 of 5 letters, 0 of 4, none, 1 of 10
+        "capitals": [400, 0, 0, 100],
+        # 7 non-space characters over 2 words, 4 over 1, none, 10 over 3
+        "wordLength": [350, 400, 0, 333],
+        # Of the 22 pairs, "aa" makes up 3 and every other pair is unique:
+        # 100 * log2(22) for the first and last text, 100 * log2(22 / 3) for "aaaa"
+        "rareBigrams": [446, 287, 0, 446],
+        "nonAscii": [0, 0, 0, 1],
+    }
+
+
+def test_pairs_are_case_folded(lib):
+    features = lib.quote_features(["ABAB", "abab"])
+    assert features["rareBigrams"][0] == features["rareBigrams"][1]
+    assert features["capitals"] == [1000, 0]
+
+
+def test_numpy_matches_pure_python(monkeypatch):
+    if quotes_lib.numpy is None:
+        pytest.skip("NumPy is not installed")
+    texts = ["İstanbul'da 5 gün!", "Ünïcödé — “quoted” text", " spaced  out ", "x", "", "ΑΒΓ αβγ"]
+    with_numpy = quotes_lib.quote_features(texts)
+    monkeypatch.setattr(quotes_lib, "numpy", None)
+    assert quotes_lib.quote_features(texts) == with_numpy
+
+
+def test_side_table_is_keyed_by_id():
+    quotes = [{"id": 7, "text": "aaaa", "source": "a", "length": 4}, {"id": 3, "text": "Hi, Bob!"}]
+    table = quotes_lib.quote_features_json("english", quotes)
+    assert table["language"] == "english"
+    assert table["scale"] == quotes_lib.FEATURE_SCALES
+    assert table["quotes"]["id"] == [7, 3]
+    assert table["quotes"]["punctuation"] == [0, 250]
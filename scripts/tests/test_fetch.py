@@ -0,0 +1,143 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import book_data
+
+GENESIS = json.dumps(book_data({1: {1: "In the beginning God created the heaven and the earth."}})).encode()
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class BookServer(ThreadingHTTPServer):
+    """A stand-in for the book source: serves `files`, answers conditional
+    requests with 304 and fails every request while `failing` is set."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), BookHandler)
+        self.files = {"/Genesis.json": GENESIS}
+        self.etags = {"/Genesis.json": '"v1"'}
+        self.failing = False
+        self.requests = []  # (path, If-None-Match, If-Modified-Since)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class BookHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        if server.failing:
+            self.send_error(503)
+            return
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = server.etags[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = BookServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(gen, cache, server, offline=False):
+    """_fetch, with the body it points to read back from the cache."""
+    digest, source = gen._fetch("Genesis.json", cache, server.url, offline)
+    if digest is None:
+        return None, source
+    with cache.open(digest) as f:
+        return f.read(), source
+
+
+def test_download_is_cached_with_validators(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    assert fetch(gen, cache, server) == (GENESIS, "downloaded")
+    assert server.requests == [("/Genesis.json", None, None)]
+
+    cache.save()
+    entry = gen.BookCache(str(tmp_path)).lookup(f"{server.url}/Genesis.json")
+    assert entry == {"sha256": gen.hashlib.sha256(GENESIS).hexdigest(), "etag": '"v1"', "last_modified": LAST_MODIFIED}
+
+
+def test_unchanged_book_is_revalidated(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    fetch(gen, cache, server)
+    assert fetch(gen, cache, server) == (GENESIS, "revalidated")
+    assert server.requests[-1] == ("/Genesis.json", '"v1"', LAST_MODIFIED)
+
+
+def test_changed_book_is_downloaded_again(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    fetch(gen, cache, server)
+    server.files["/Genesis.json"] = GENESIS.replace(b"beginning", b"start")
+    server.etags["/Genesis.json"] = '"v2"'
+    body, source = fetch(gen, cache, server)
+    assert source == "downloaded" and b"start" in body
+    assert cache.digest(f"{server.url}/Genesis.json") == gen.hashlib.sha256(body).hexdigest()
+
+
+def test_large_book_is_streamed_to_the_cache(gen, server, tmp_path):
+    verses = {n: f"Verse {n} " + "word " * 40 for n in range(1, 800)}
+    server.files["/Genesis.json"] = json.dumps(book_data({1: verses})).encode()
+    assert len(server.files["/Genesis.json"]) > 2 * gen.FETCH_BLOCK_SIZE
+    cache = gen.BookCache(str(tmp_path))
+    assert fetch(gen, cache, server) == (server.files["/Genesis.json"], "downloaded")
+    assert not [name for name in (tmp_path / "objects").iterdir() if name.suffix == ".tmp"]
+
+
+def test_corrupt_cache_object_is_not_used(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    fetch(gen, cache, server)
+    with open(cache.object_path(gen.hashlib.sha256(GENESIS).hexdigest()), "wb") as f:
+        f.write(b"{}")
+    assert fetch(gen, cache, server) == (GENESIS, "downloaded")
+    assert server.requests[-1] == ("/Genesis.json", None, None)
+
+
+def test_offline_never_touches_the_network(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    assert fetch(gen, cache, server, offline=True) == (None, "missing")
+    fetch(gen, cache, server)
+    assert fetch(gen, cache, server, offline=True) == (GENESIS, "offline")
+    assert len(server.requests) == 1
+
+
+def test_stale_copy_when_the_source_fails(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    server.failing = True
+    assert fetch(gen, cache, server) == (None, "failed")
+    server.failing = False
+    fetch(gen, cache, server)
+    server.failing = True
+    assert fetch(gen, cache, server) == (GENESIS, "stale")
+
+
+def test_iter_books_keeps_order_and_saves_the_cache(gen, server, tmp_path):
+    cache = gen.BookCache(str(tmp_path))
+    books = list(gen.iter_books(["Exodus", "Genesis", "Nowhere"], cache, server.url, workers=2))
+    assert books == [("Exodus", None), ("Genesis", gen.hashlib.sha256(GENESIS).hexdigest()), ("Nowhere", None)]
+    assert f"{server.url}/Genesis.json" in gen.BookCache(str(tmp_path)).index
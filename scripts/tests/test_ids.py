@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from conftest import book_data
+
+SOURCE_URL = "http://books.invalid"
+GENESIS = book_data({1: {n: f"Verse {n} of the first chapter, long enough to keep." for n in range(1, 9)}})
+REFS = ["Genesis 1:1", "Genesis 1:2", "Genesis 1:3-4", "Genesis 1:5", "Genesis 1:6-8"]
+
+
+@pytest.fixture
+def run(gen, tmp_path, monkeypatch):
+    """Run the generator offline over `refs` against a cache holding Genesis."""
+    cache = gen.BookCache(str(tmp_path / "cache"))
+    cache.store(f"{SOURCE_URL}/Genesis.json", json.dumps(GENESIS).encode(), None, None)
+    cache.save()
+    output = tmp_path / "english.json"
+
+    def run(refs, source_url=SOURCE_URL):
+        monkeypatch.setattr(gen, "CATEGORIES", [("test", refs)])
+        code = gen.main(["--offline", "--source-url", source_url, "--cache-dir", str(tmp_path / "cache"),
+                         "--output", str(output)])
+        quotes = json.loads(output.read_text())["quotes"] if output.exists() else []
+        return code, {q["source"]: q["id"] for q in quotes}
+
+    return run
+
+
+def test_ids_survive_a_dropped_reference(run):
+    code, first = run(REFS)
+    assert code == 0
+    assert first == {"Genesis 1:1": 1, "Genesis 1:2": 2, "Genesis 1:3-4": 3, "Genesis 1:5": 4, "Genesis 1:6-8": 5}
+
+    code, second = run([ref for ref in REFS if ref != "Genesis 1:6-8"])
+    assert code == 0
+    assert second == {source: qid for source, qid in first.items() if source != "Genesis 1:6-8"}
+
+    # The dropped quote's id stays retired, and comes back with its quote
+    _, third = run(REFS[:-1] + ["Genesis 1:7"])
+    assert third["Genesis 1:7"] == 6
+    _, fourth = run(REFS)
+    assert fourth["Genesis 1:6-8"] == 5
+
+
+def test_ledger_outlives_the_cache(run, tmp_path):
+    run(REFS)
+    run(REFS[:-1])
+    (tmp_path / "cache" / "manifest.json").unlink()
+    _, ids = run(REFS[:-1] + ["Genesis 1:7"])
+    assert ids["Genesis 1:7"] == 6
+
+
+def test_unresolved_runs_write_nothing(run, tmp_path):
+    run(REFS)
+    before = (tmp_path / "english.json").read_bytes()
+
+    # A cache filled from another source has none of this source's books
+    code, _ = run(REFS, source_url="http://other.invalid")
+    assert code == 1
+    assert (tmp_path / "english.json").read_bytes() == before
+
+    code, _ = run(REFS + ["Genesis 9:1"])
+    assert code == 1
+    assert (tmp_path / "english.json").read_bytes() == before
+
+    code, _ = run([])
+    assert code == 1
+    assert (tmp_path / "english.json").read_bytes() == before
+
+
+def test_reused_texts_match_a_fresh_extraction(run, tmp_path):
+    run(REFS)
+    fresh = (tmp_path / "english.json").read_bytes()
+    verses = GENESIS["chapters"][0]["verses"]
+    assert json.loads(fresh)["quotes"][2]["text"] == f"{verses[2]['text']} {verses[3]['text']}"
+
+    # The second run takes every text but Genesis 1:1 from the last build
+    run(REFS[1:])
+    run(REFS)
+    assert (tmp_path / "english.json").read_bytes() == fresh
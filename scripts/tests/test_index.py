@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from conftest import book_data
+
+
+def verse(chapter: int, n: int) -> str:
+    """A verse exactly 50 characters long."""
+    return f"Chapter {chapter} verse {n}".ljust(49, "x") + "."
+
+
+# Four 50-character verses make 203 characters of text per chapter
+BOOKS = {
+    "Genesis": {c: {n: verse(c, n) for n in range(1, 5)} for c in range(1, 4)},
+    "Ruth": {1: {n: verse(1, n) for n in range(1, 5)}},
+}
+THEMES = {"love": {"genesis": {"1": [1, 2]}, "ruth": {"1": [4, 4]}}}
+
+
+@pytest.fixture
+def bible_dir(gen, tmp_path):
+    """A bible/ directory as --full writes it, before the frontend build indexes it."""
+    for book, chapters in BOOKS.items():
+        index = gen.BookIndex(book_data(chapters))
+        (tmp_path / f"{gen.book_slug(book)}.json").write_text(json.dumps(gen.bible_book_json(book, index)))
+    (tmp_path / "books.json").write_text(json.dumps(gen.books_json(BOOKS)))
+    (tmp_path / "themes.json").write_text(json.dumps(THEMES))
+    return tmp_path
+
+
+def index(gen, bible_dir, shard_size="450"):
+    assert gen.main(["--index-dir", str(bible_dir), "--shard-size", shard_size]) == 0
+    return json.loads((bible_dir / "shards.json").read_text())
+
+
+def test_shards_split_books_into_chapter_runs(gen, bible_dir):
+    manifest = index(gen, bible_dir)
+    assert manifest["groups"] == gen.QUOTE_GROUPS
+    assert [(s["book"], s["file"], s["chapters"]) for s in manifest["shards"]] == [
+        ("genesis", "genesis-1-2.json", [1, 2]),
+        ("genesis", "genesis-3-3.json", [3, 3]),
+        ("ruth", "ruth-1-1.json", [1, 1]),
+    ]
+    assert sorted(p.name for p in (bible_dir / "shards").iterdir()) == ["genesis-1-2.json", "genesis-3-3.json",
+                                                                         "ruth-1-1.json"]
+
+    for entry in manifest["shards"]:
+        path = bible_dir / "shards" / entry["file"]
+        shard = json.loads(path.read_text())
+        book = json.loads((bible_dir / f"{entry['book']}.json").read_text())
+        first, last = entry["chapters"]
+        assert shard["name"] == book["name"]
+        assert shard["chapters"] == {ch: verses for ch, verses in book["chapters"].items() if first <= int(ch) <= last}
+        assert entry["size"] == path.stat().st_size
+        assert entry["counts"] == [len(group) // 4 for group in shard["passages"]]
+
+
+def test_shard_passages_add_up_to_the_book_index(gen, bible_dir):
+    manifest = index(gen, bible_dir)
+    passages = json.loads((bible_dir / "passages" / "genesis.json").read_text())["passages"]
+    shards = [json.loads((bible_dir / "shards" / e["file"]).read_text())
+              for e in manifest["shards"] if e["book"] == "genesis"]
+    assert [sum((s["passages"][g] for s in shards), []) for g in range(len(passages))] == passages
+
+    # Per chapter: verses 1 to 4 alone, then 1-2, 3-4, 1-3 and 1-4; passages repeated by larger chunk sizes count once
+    counts = [sum(e["counts"][g] for e in manifest["shards"] if e["book"] == "genesis") for g in range(4)]
+    assert counts == [3 * 4, 3 * 4, 0, 0]
+
+
+def test_theme_counts_chunk_only_the_themed_verses(gen, bible_dir):
+    manifest = index(gen, bible_dir)
+    themes = {entry["file"]: entry["themes"] for entry in manifest["shards"]}
+    # Verses 1-2: both alone, then together (101 characters) once per chunk size from 2 up
+    assert themes == {
+        "genesis-1-2.json": {"love": [2, 5, 0, 0]},
+        "genesis-3-3.json": {},
+        "ruth-1-1.json": {"love": [6, 0, 0, 0]},
+    }
+
+
+def test_reindexing_prunes_stale_shards(gen, bible_dir, capsys):
+    index(gen, bible_dir)
+    (bible_dir / "shards" / "genesis-9-9.json").write_text("{}")
+    (bible_dir / "shards" / "genesis-9-9.json.gz").write_bytes(b"")
+    capsys.readouterr()
+    manifest = index(gen, bible_dir, shard_size="1K")
+    assert [e["file"] for e in manifest["shards"]] == ["genesis-1-3.json", "ruth-1-1.json"]
+    assert sorted(p.name for p in (bible_dir / "shards").iterdir()) == ["genesis-1-3.json", "ruth-1-1.json"]
+    # The new shard and shards.json, and four removed files
+    assert "Updated 6 files" in capsys.readouterr().out
+
+    index(gen, bible_dir, shard_size="1K")
+    assert "Updated 0 files" in capsys.readouterr().out
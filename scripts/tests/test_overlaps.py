@@ -0,0 +1,58 @@
+import pytest
+
+REFS = [
+    "John 3:16-17",
+    "John 3:16",  # nested in John 3:16-17
+    "John 3:17-18",  # overlaps John 3:16-17
+    "Psalm 23:1",
+    "Psalm 23:1-1",  # the same verses as Psalm 23:1
+    "Psalm 23:4-6",
+    "John 4:16",  # same verses, other chapter
+    "Psalm 23",  # not a quote reference, left alone
+]
+REPORT = [
+    ("nested", "John 3:16", "John 3:16-17"),
+    ("overlap", "John 3:17-18", "John 3:16-17"),
+    ("duplicate", "Psalm 23:1-1", "Psalm 23:1"),
+]
+
+
+def test_relations_and_clusters(gen):
+    relations, clusters = gen.find_overlaps([gen.parse_reference(ref) for ref in REFS[:-1]])
+    assert relations == [("nested", 1, 0), ("overlap", 2, 0), ("duplicate", 4, 3)]
+    assert clusters == [[0, 1, 2], [3, 4]]
+
+
+def test_ranges_compare_with_the_furthest_reaching_one(gen):
+    ranges = [("Genesis", 1, 1, 10), ("Genesis", 1, 2, 3), ("Genesis", 1, 5, 6), ("Genesis", 1, 9, 12),
+              ("Genesis", 1, 13, 13)]
+    relations, clusters = gen.find_overlaps(ranges)
+    assert relations == [("nested", 1, 0), ("nested", 2, 0), ("overlap", 3, 0)]
+    assert clusters == [[0, 1, 2, 3]]
+
+
+def test_keep_changes_nothing(gen):
+    assert gen.resolve_overlaps(REFS, "keep") == (REFS, REPORT)
+
+
+def test_drop_nested_keeps_partial_overlaps(gen):
+    refs, report = gen.resolve_overlaps(REFS, "drop-nested")
+    assert refs == ["John 3:16-17", "John 3:17-18", "Psalm 23:1", "Psalm 23:4-6", "John 4:16", "Psalm 23"]
+    assert report == REPORT
+
+
+def test_merge_replaces_each_cluster_where_it_started(gen):
+    refs, report = gen.resolve_overlaps(REFS, "merge")
+    assert refs == ["John 3:16-18", "Psalm 23:1", "Psalm 23:4-6", "John 4:16", "Psalm 23"]
+    assert report == REPORT + [
+        ("merged", "John 3:16-17", "John 3:16-18"),
+        ("merged", "John 3:16", "John 3:16-18"),
+        ("merged", "John 3:17-18", "John 3:16-18"),
+        ("merged", "Psalm 23:1-1", "Psalm 23:1"),
+    ]
+
+
+@pytest.mark.parametrize("policy", ["keep", "drop-nested", "merge"])
+def test_separate_references_are_untouched(gen, policy):
+    refs = ["Genesis 1:1", "Genesis 1:2", "Genesis 2:1", "Exodus 1:1"]
+    assert gen.resolve_overlaps(refs, policy) == (refs, [])
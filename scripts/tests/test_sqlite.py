@@ -0,0 +1,70 @@
+import os
+import sqlite3
+
+import pytest
+
+from conftest import book_data
+
+PSALM_23 = {
+    1: "The LORD is my shepherd; I shall not want.",
+    2: "He maketh me to lie down in green pastures: he leadeth me beside the still waters.",
+    3: "He restoreth my soul: he leadeth me in the paths of righteousness for his name's sake.",
+}
+PSALM_24 = {
+    1: "The earth is the LORD'S, and the fulness thereof; the world, and they that dwell therein.",
+}
+
+# The queries from the SqliteExport docstring
+RANDOM_PASSAGE = """
+SELECT p.* FROM themes t JOIN passages p
+  ON p.first_verse BETWEEN t.first_verse AND t.last_verse AND p.last_verse <= t.last_verse
+WHERE t.theme = ? AND p.length_group = ? ORDER BY random() LIMIT 1
+"""
+SEARCH = """
+SELECT v.* FROM verses_fts JOIN verses v ON v.id = verses_fts.rowid
+WHERE verses_fts MATCH ? ORDER BY rank
+"""
+
+
+def build(gen, path):
+    index = gen.BookIndex(book_data({23: PSALM_23, 24: PSALM_24}))
+    export = gen.SqliteExport(path)
+    export.add_book("Psalm", index)
+    export.add_theme("comfort", "Psalm", gen.theme_spans(index, *gen.parse_theme_reference("Psalm 23")[1:]))
+    quote = {"text": PSALM_23[1], "source": "Psalm 23:1", "length": len(PSALM_23[1])}
+    export.add_quotes([quote], {"Psalm 23:1": 7})
+    return export
+
+
+def test_documented_queries(gen, tmp_path):
+    path = str(tmp_path / "bible.sqlite")
+    assert build(gen, path).finish()
+    assert not os.path.exists(f"{path}.tmp")
+
+    conn = sqlite3.connect(path)
+    first, last = gen.verse_id("Psalm", 23, 1), gen.verse_id("Psalm", 23, 3)
+    for group in (0, 1):
+        row = conn.execute(RANDOM_PASSAGE, ("comfort", group)).fetchone()
+        assert row is not None
+        assert first <= row[1] <= row[2] <= last
+    assert conn.execute(RANDOM_PASSAGE, ("comfort", 3)).fetchone() is None
+    assert conn.execute("SELECT id, first_verse FROM quotes").fetchall() == [(7, first)]
+
+    if not gen.sqlite_has_fts5(conn):
+        pytest.skip("sqlite3 built without FTS5")
+    rows = conn.execute(SEARCH, ("pastures",)).fetchall()
+    assert [row[0] for row in rows] == [gen.verse_id("Psalm", 23, 2)]
+
+
+def test_unchanged_database_is_not_rewritten(gen, tmp_path):
+    path = str(tmp_path / "bible.sqlite")
+    build(gen, path).finish()
+    assert not build(gen, path).finish()
+
+
+def test_failed_build_leaves_no_temp_file(gen, tmp_path):
+    path = str(tmp_path / "bible.sqlite")
+    with pytest.raises(RuntimeError):
+        with build(gen, path):
+            raise RuntimeError("interrupted")
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from conftest import load_script
+from quotes_lib import ERROR, QUOTE_GROUPS, WARNING, js_length, validate_quote_data
+
+
+def quote_file(language: str, *texts: str) -> dict:
+    return {"language": language, "groups": QUOTE_GROUPS, "quotes": [
+        {"id": n, "text": text, "source": "test", "length": js_length(text)} for n, text in enumerate(texts, start=1)
+    ]}
+
+
+def problems(language: str, *texts: str) -> list[tuple[str, str, str]]:
+    return validate_quote_data(quote_file(language, *texts), language)
+
+
+@pytest.mark.parametrize("text, glyph", [
+    ("Enter your pаssword", "U+0430 looks like 'a'"),  # Cyrillic a
+    ("hellο world", "U+03BF looks like 'o'"),  # Greek omicron
+    ("рay now", "U+0440 looks like 'p'"),  # Cyrillic er, first in the word
+])
+def test_homoglyphs_in_latin_words_are_errors(text, glyph):
+    [(qid, level, problem)] = problems("english", text)
+    assert (qid, level) == ("1", ERROR)
+    assert "mixes Latin and other scripts" in problem and glyph in problem
+
+
+@pytest.mark.parametrize("text", [
+    "мама and papa",  # the same letter in an all-Cyrillic word
+    "Un café très cher",  # accented Latin letters are ordinary French
+    "αλφα ομεγα",  # Greek text
+])
+def test_other_scripts_on_their_own_pass(text):
+    assert problems("english", text) == []
+
+
+def test_carriage_returns_are_errors_even_in_code():
+    assert problems("code_python", "def f():\n\treturn 1") == []
+    [(_, level, problem)] = problems("code_python", "def f():\r\n\treturn 1")
+    assert level == ERROR and "U+000D" in problem
+    [(_, level, problem)] = problems("english", "Two lines\r\nof prose")
+    assert level == ERROR and "U+000D" in problem
+
+
+def test_deliberate_typography_only_warns():
+    assert problems("french", "Quoi\u00a0?", "Cafe\u0301 noir") == [
+        ("1", WARNING, "contains U+00A0 NO-BREAK SPACE"),
+        ("2", WARNING, "is not NFC-normalized"),
+    ]
+
+
+@pytest.fixture(scope="module")
+def validate():
+    return load_script("validate-quotes")
+
+
+def write(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def test_strict_fails_on_warnings(validate, tmp_path, capsys):
+    path = write(tmp_path / "french.json", quote_file("french", "Quoi\u00a0?"))
+    assert validate.main(["--jobs", "1", path]) == 0
+    assert validate.main(["--jobs", "1", "--strict", path]) == 1
+    assert f"WARNING {path}:1: contains U+00A0 NO-BREAK SPACE" in capsys.readouterr().err
+
+
+def test_errors_fail_without_strict(validate, tmp_path, capsys):
+    clean = write(tmp_path / "english.json", quote_file("english", "All good here."))
+    broken = write(tmp_path / "german.json", quote_file("german", "Zeile\r\nzwei"))
+    assert validate.main(["--jobs", "1", clean]) == 0
+    assert validate.main(["--jobs", "1", clean, broken]) == 1
+    out, err = capsys.readouterr()
+    assert "2 files checked, 1 with problems (1 errors, 0 warnings)" in out
+    assert f"ERROR   {broken}:1: contains U+000D" in err
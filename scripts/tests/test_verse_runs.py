@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+
+def covering_run(runs, first, last):
+    """Whether one run covers first..last whole, as isInTheme() in bible-controller.ts checked."""
+    for i in range(0, len(runs), 2):
+        if runs[i] > first:
+            return False
+        if last <= runs[i + 1]:
+            return True
+    return False
+
+
+def test_spans_merge_into_sorted_runs(gen):
+    assert gen.verse_runs([(10, 12), (1, 3), (4, 5), (2, 2), (14, 20), (15, 16)]) == [1, 5, 10, 12, 14, 20]
+    assert gen.verse_runs([]) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_runs_round_trip_through_the_frontend_checks(gen, seed):
+    rng = random.Random(seed)
+    spans = []
+    for _ in range(rng.randint(1, 8)):
+        first = rng.randint(1, 40)
+        spans.append((first, first + rng.randint(0, 6)))
+    runs = gen.verse_runs(spans)
+    verses = {v for first, last in spans for v in range(first, last + 1)}
+
+    # Runs are disjoint, sorted and never touch, so each verse has one run to be in
+    assert all(a < b - 1 for a, b in zip(runs[1::2], runs[2::2]))
+    for verse in range(0, 50):
+        assert gen.in_verse_runs(runs, verse) == (verse in verses)
+    for first in range(1, 48):
+        for last in range(first, first + 3):
+            covered = all(v in verses for v in range(first, last + 1))
+            assert covering_run(runs, first, last) == covered
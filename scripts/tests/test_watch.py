@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from conftest import book_data
+
+SOURCE_URL = "http://books.invalid"
+GENESIS = book_data({1: {n: f"Verse {n} of the first chapter, long enough to keep." for n in range(1, 9)}})
+
+
+def lists(refs) -> str:
+    return f"CATEGORIES = [('test', {refs!r})]\nTHEMES = {{}}\n"
+
+
+@pytest.fixture
+def setup(gen, tmp_path, monkeypatch):
+    """A cache holding Genesis, and a stand-in for the script the watcher reloads."""
+    cache = gen.BookCache(str(tmp_path / "cache"))
+    cache.store(f"{SOURCE_URL}/Genesis.json", json.dumps(GENESIS).encode(), None, None)
+    cache.save()
+    script = tmp_path / "lists.py"
+    script.write_text(lists(["Genesis 1:1", "Genesis 1:2"]))
+    monkeypatch.setattr(gen, "__file__", str(script))
+    args = ["--offline", "--source-url", SOURCE_URL, "--cache-dir", str(tmp_path / "cache"),
+            "--output", str(tmp_path / "english.json")]
+    return script, args
+
+
+def sources(path) -> list[str]:
+    return [q["source"] for q in json.loads(path.read_text())["quotes"]]
+
+
+def save(script, text: str):
+    """Rewrite the script with a later mtime, whatever the file system's timestamp resolution."""
+    stamp = os.stat(script).st_mtime_ns + 10**9
+    script.write_text(text)
+    os.utime(script, ns=(stamp, stamp))
+
+
+def test_refresh_resolves_only_new_references(gen, setup, tmp_path):
+    _, args = setup
+    watcher = gen.Watcher(gen.parse_args(args))
+    assert watcher.refresh([("test", ["Genesis 1:1", "Genesis 1:2"])], {}) == \
+        "2 references resolved, 2 quotes, rewrote english.json"
+    assert watcher.refresh([("test", ["Genesis 1:1", "Genesis 1:2"])], {}) == \
+        "0 references resolved, 2 quotes, no changes"
+    assert watcher.refresh([("test", ["Genesis 1:1", "Genesis 1:2", "Genesis 1:3-4"])], {}) == \
+        "1 references resolved, 3 quotes, rewrote english.json"
+    assert sources(tmp_path / "english.json") == ["Genesis 1:1", "Genesis 1:2", "Genesis 1:3-4"]
+
+    before = (tmp_path / "english.json").read_bytes()
+    assert watcher.refresh([("test", ["Genesis 1:1", "Genesis 9:1"])], {}).startswith("not rebuilding: ")
+    assert (tmp_path / "english.json").read_bytes() == before
+
+
+def test_saving_the_script_triggers_a_rebuild(gen, setup, tmp_path, monkeypatch, capsys):
+    script, args = setup
+    output = tmp_path / "english.json"
+    edits = [
+        lambda: save(script, "CATEGORIES = [\n"),  # half-way through an edit
+        lambda: save(script, lists(["Genesis 1:1", "Genesis 1:2", "Genesis 1:5"])),
+        lambda: None,  # no change: no rebuild
+    ]
+    seen = []
+
+    def sleep(_):
+        seen.append(sources(output))
+        if not edits:
+            raise KeyboardInterrupt
+        edits.pop(0)()
+
+    monkeypatch.setattr(gen.time, "sleep", sleep)
+    assert gen.main(["--watch", *args]) == 0
+    assert seen == [["Genesis 1:1", "Genesis 1:2"]] * 2 + [["Genesis 1:1", "Genesis 1:2", "Genesis 1:5"]] * 2
+
+    out, err = capsys.readouterr()
+    assert "Not rebuilding, the script does not load: SyntaxError" in err
+    summaries = [line.split("] ", 1)[1].rsplit(" in ", 1)[0] for line in out.splitlines() if line.startswith("[")]
+    assert summaries == [
+        "2 references resolved, 2 quotes, rewrote english.json",
+        "1 references resolved, 3 quotes, rewrote english.json",
+    ]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Validates every quote file in frontend/static/quotes and every generated
+Bible file in frontend/static/bible (books, passage indexes and shards)
+against the contracts in packages/schemas: QuoteDataSchema's layout,
+non-negative unique integer ids, positive lengths that match the text as
+String.length counts it, and text free of control or invisible characters,
+non-NFC forms and the cross-script homoglyphs listed in
+packages/schemas/src/validation/homoglyphs.ts.
+
+The rules live in quotes_lib.py, which generate-bible-quotes.py also applies
+to its own output. Files are checked in parallel on a process pool and every
+violation is printed as file:id: problem. The exit code is 1 if there are
+errors, so it can gate CI; warnings (non-NFC text, no-break spaces), which
+are often deliberate, only fail the run with --strict.
+"""
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from quotes_lib import ERROR, STATIC_DIR, WARNING, is_hashed_name, validate_file
+
+DEFAULT_PATTERNS = [
+    os.path.join("quotes", "*.json"),
+    os.path.join("bible", "*.json"),
+    os.path.join("bible", "passages", "*.json"),
+    os.path.join("bible", "shards", "*.json"),
+]
+
+def default_files() -> list[str]:
+    files = []
+    for pattern in DEFAULT_PATTERNS:
+        files += sorted(glob.glob(os.path.join(STATIC_DIR, pattern)))
+    # Published copies (english.<hash>.json) duplicate their logical file
+    return [f for f in files if not is_hashed_name(os.path.basename(f))]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate Monkeytype quote and Bible files.")
+    parser.add_argument("files", nargs="*",
+                        help="files to check (default: all quote files and generated Bible files)")
+    parser.add_argument("--strict", action="store_true", help="fail on warnings as well as errors")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per CPU)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = args.files or default_files()
+
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(validate_file, files, chunksize=8))
+
+    counts = {ERROR: 0, WARNING: 0}
+    failed = 0
+    for path, problems in zip(files, results):
+        name = path if args.files else os.path.relpath(path, STATIC_DIR)
+        for qid, level, problem in problems:
+            where = f"{name}:{qid}" if qid else name
+            print(f"  {level.upper():<7} {where}: {problem}", file=sys.stderr)
+            counts[level] += 1
+        failed += bool(problems)
+
+    print(f"\n{len(files)} files checked, {failed} with problems "
+          f"({counts[ERROR]} errors, {counts[WARNING]} warnings)")
+    if counts[ERROR] or (args.strict and counts[WARNING]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())